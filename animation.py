@@ -0,0 +1,83 @@
+import pygame
+import atlas
+
+
+# Animation clips. A clip is the frames of one animation of a character facing
+# one way. Clips are made once per character and shared by everything that
+# plays them. An instance only keeps which clip it plays, when it started and
+# which way it faces. The frame to show is worked out from the clock, which
+# the game moves on once a step. Every frame's collision mask is made along
+# with the clip, so hit tests never build one.
+
+# MILLISECONDS EACH FRAME IS SHOWN
+frame_ms = 100
+
+
+class Clip:
+    """Shared by every instance playing it, so its fields are read only."""
+    __slots__ = ('_frames', '_masks', '_frame_ms', '_loop')
+
+    def __init__(self, frames, frame_ms, loop=True):
+        self._frames = tuple(frames)
+        self._masks = tuple(pygame.mask.from_surface(frame) for frame in self._frames)
+        self._frame_ms = frame_ms
+        self._loop = loop
+
+    @property
+    def frames(self):
+        return self._frames
+
+    @property
+    def masks(self):
+        return self._masks
+
+    @property
+    def frame_ms(self):
+        return self._frame_ms
+
+    @property
+    def loop(self):
+        return self._loop
+
+    def __len__(self):
+        return len(self.frames)
+
+    def index(self, elapsed):
+        """Frame number elapsed milliseconds after the clip started."""
+        count = int(elapsed // self.frame_ms)
+        if self.loop:
+            return count % len(self.frames)
+        return min(count, len(self.frames) - 1)
+
+    def frame(self, elapsed):
+        return self.frames[self.index(elapsed)]
+
+    def mask(self, elapsed):
+        return self.masks[self.index(elapsed)]
+
+
+# THE Clip OBJECTS AND THEIR MASKS, MADE ONCE FROM THE FRAMES atlas.loaded KEEPS
+loaded = {}
+
+
+def load_clips(character, block_size):
+    """{(clip, side): Clip} of a character, side is 'rt' or 'lt'."""
+    key = (character, block_size)
+    if key not in loaded:
+        frames = atlas.load_frames(character, block_size)
+        loaded[key] = {(clip, side): Clip(images, frame_ms)
+                       for clip, sides in frames.items() for side, images in sides.items()}
+    return loaded[key]
+
+
+class AnimationClock:
+
+    def __init__(self):
+        """The one time every animation is played against."""
+        self.now = 0
+
+    def tick(self, now):
+        self.now = now
+
+
+clock = AnimationClock()
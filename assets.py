@@ -0,0 +1,93 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import pygame
+from spritesheet import surface_cache
+
+
+# Images are decoded on worker threads, pygame.image.load() lets go of the GIL
+# while it works. Converting them to the display format has to happen on the
+# main thread, pump() does that a few at a time between frames. Anything that
+# loads a file through the surface cache before then waits for its decode
+# instead of starting another one.
+
+# THREADS DECODING AT ONCE
+workers = 4
+
+
+# ASSET LOADER
+################################################################################
+class AssetLoader:
+
+    def __init__(self, cache=surface_cache):
+        self.cache = cache
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix='assets')
+
+        # (FILE, ALPHA) WAITING TO BE CONVERTED, IN THE ORDER ASKED FOR
+        self.queued = []
+        self.requested = 0
+        self.converted = 0
+
+
+    def request(self, assets):
+        """Start decoding (file, alpha) pairs, as surface_cache.load() takes
+        them, that are not cached or on their way already. Used for what is
+        needed right now and to prefetch what comes next.
+        """
+        for filename, alpha in assets:
+            if (filename, alpha) in self.queued or self.cache.file_key(filename, alpha) in self.cache.entries:
+                continue
+            if filename not in self.cache.pending:
+                self.cache.pending[filename] = self.pool.submit(pygame.image.load, filename)
+            self.queued.append((filename, alpha))
+            self.requested += 1
+
+
+    def pump(self, budget_ms=4):
+        """Convert decoded images until budget_ms is used up. Returns True
+        once everything asked for is in the cache.
+        """
+        start = time.perf_counter()
+        for asset in list(self.queued):
+            if (time.perf_counter() - start) * 1000 >= budget_ms:
+                break
+
+            future = self.cache.pending.get(asset[0])
+            if future is not None and not future.done():
+                continue
+
+            self.convert(*asset)
+            self.queued.remove(asset)
+
+        return not self.queued
+
+
+    def wait(self, timeout):
+        """Sleep until another decode finishes, at most timeout seconds."""
+        decoding = [self.cache.pending[filename] for filename, alpha in self.queued if filename in self.cache.pending]
+        wait(decoding, timeout, FIRST_COMPLETED)
+
+
+    def progress(self):
+        """How much of what was asked for is ready, from 0 to 1."""
+        if not self.requested:
+            return 1
+        return self.converted / self.requested
+
+
+    def finish(self):
+        """Wait for and convert everything asked for."""
+        for asset in self.queued:
+            self.convert(*asset)
+        self.queued = []
+
+
+    def convert(self, filename, alpha):
+        """Put one decoded image in the cache. A file that cannot be read
+        is reported and quits, like SpriteSheet.sheet.
+        """
+        try:
+            self.cache.load(filename, alpha)
+        except (pygame.error, FileNotFoundError) as e:
+            print(f"Unable to load spritesheet image: {filename}")
+            raise SystemExit(e)
+        self.converted += 1
@@ -0,0 +1,241 @@
+import hashlib, json, os, sys
+import pygame
+from spritesheet import SpriteSheet, surface_cache
+
+
+# Baked animation frames for the player and enemy.
+# Run "python atlas.py" after changing a sheet or a rectangle below, the game
+# falls back to slicing the source sheets while the atlas is stale.
+
+ATLAS_IMAGE = 'characters_atlas.png'
+ATLAS_MANIFEST = 'characters_atlas.json'
+ATLAS_WIDTH = 1024
+ATLAS_VERSION = 1
+
+
+def grid(num_cols, x_margin, x_padding, y_margin, width, height):
+    """Rectangles of one row of a grid, like SpriteSheet.load_grid_images()."""
+    return [(x_margin + col_num * (width + x_padding), y_margin, width, height)
+            for col_num in range(num_cols)]
+
+
+# FRAME RECTANGLES
+################################################################################
+PLAYER_IDLE = (444, 49, 141, 229)
+
+# self.ninja_run_rt_list_wrong = self.ninja_sheet.load_grid_images(1, 10, 450, 60, 1026, 0, 155, 228, -1)
+PLAYER_RUN = [(450, 1026, 152, 221),
+              (645, 795, 150, 222),
+              (882, 1031, 142, 223),
+              (1074, 1033, 138, 224),
+              (1260, 1035, 139, 226),
+              (1431, 1034, 141, 228),
+              (1616, 1033, 139, 224),
+              (1809, 1032, 141, 224),
+              (1998, 1031, 141, 224),
+              PLAYER_IDLE]
+
+PLAYER_HIT = grid(10, 445, 56, 515, 140, 222) + [(445, 547, 140, 222),
+                                                 (639, 554, 161, 214),
+                                                 (800, 555, 155, 210),
+                                                 (990, 559, 173, 206),
+                                                 (1181, 554, 179, 213),
+                                                 (1379, 539, 149, 230),
+                                                 (1579, 539, 147, 256),
+                                                 (1757, 548, 146, 257),
+                                                 (1949, 544, 132, 241),
+                                                 PLAYER_IDLE]
+
+PLAYER_JUMP = grid(10, 437, 46, 1262, 158, 213) + [PLAYER_IDLE,
+                                                   (636, 1262, 159, 216),
+                                                   (827, 1262, 168, 219),
+                                                   (1031, 1265, 176, 218),
+                                                   (1242, 1266, 176, 216),
+                                                   (1242, 1266, 176, 216),
+                                                   (1631, 1265, 176, 215),
+                                                   (1832, 1263, 170, 216),
+                                                   (2042, 1263, 158, 216),
+                                                   PLAYER_IDLE]
+
+ENEMY_IDLE = (62, 79, 196, 239)
+
+ENEMY_RUN = [(68, 1230, 190, 234),
+             (315, 1225, 191, 238),
+             (563, 1222, 191, 237),
+             (804, 1225, 184, 236),
+             (1015, 1227, 176, 237),
+             (1015, 1227, 176, 237),
+             (1427, 1227, 179, 234),
+             (563, 1222, 191, 237),
+             (315, 1225, 191, 238),
+             (68, 1230, 190, 234)]
+
+
+# clip name: (rectangles, colorkey, size as a multiple of block_size)
+CHARACTERS = {
+    'player': {'sheet': 'SamuraiLight.png',
+               'clips': {'idle': ([PLAYER_IDLE], -1, (.9, 1.25)),
+                         'run': (PLAYER_RUN, -1, (.9, 1.25)),
+                         'hit': (PLAYER_HIT, -1, (.95, 1.25)),
+                         'jump': (PLAYER_JUMP, -1, (.95, 1.25))}},
+
+    'enemy': {'sheet': 'Ninja.png',
+              'clips': {'idle': ([ENEMY_IDLE], (0, 0, 0), (1.15, 1.25)),
+                        'run': (ENEMY_RUN, -1, (1.15, 1.25))}},
+}
+
+
+# LIVE SLICING
+################################################################################
+def slice_frames(character, block_size):
+    """Cut a character's frames out of its source sheet.
+    Returns {clip: {'rt': [surfaces], 'lt': [surfaces]}}.
+    """
+    spec = CHARACTERS[character]
+    sheet = SpriteSheet(spec['sheet'])
+
+    frames = {}
+    for clip, (rects, colorkey, size) in spec['clips'].items():
+        scale = (block_size * size[0], block_size * size[1])
+        frames[clip] = {'rt': sheet.images_at(rects, colorkey, scale),
+                        'lt': sheet.images_at(rects, colorkey, scale, (True, False))}
+    return frames
+
+
+# ATLAS
+################################################################################
+def file_hash(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def spec_hash(block_size):
+    """Changes whenever a rectangle, colorkey, size or block_size changes."""
+    text = repr((ATLAS_VERSION, block_size, sorted(CHARACTERS.items())))
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def bake(block_size, image_path=ATLAS_IMAGE, manifest_path=ATLAS_MANIFEST):
+    """Slice, scale and flip every frame and pack them into one image.
+    Frames used more than once in a clip are stored once.
+    """
+    cells = {}
+    placed = []
+    x = y = shelf_h = 0
+
+    manifest = {'version': ATLAS_VERSION,
+                'block_size': block_size,
+                'spec': spec_hash(block_size),
+                'sources': {},
+                'image': image_path,
+                'characters': {}}
+
+    for character, spec in CHARACTERS.items():
+        manifest['sources'][spec['sheet']] = file_hash(spec['sheet'])
+        frames = slice_frames(character, block_size)
+        clips = manifest['characters'][character] = {}
+
+        for clip, (rects, colorkey, size) in spec['clips'].items():
+            clips[clip] = {}
+            for side in ('rt', 'lt'):
+                clips[clip][side] = []
+                for rect, image in zip(rects, frames[clip][side]):
+                    key = (spec['sheet'], tuple(rect), colorkey, size, side)
+                    if key not in cells:
+                        w, h = image.get_size()
+                        # SHELF PACKING, A NEW ROW WHEN THIS ONE IS FULL
+                        if x + w > ATLAS_WIDTH:
+                            x = 0
+                            y += shelf_h
+                            shelf_h = 0
+                        cells[key] = [x, y, w, h]
+                        placed.append((image, (x, y)))
+                        x += w
+                        shelf_h = max(shelf_h, h)
+                    clips[clip][side].append(cells[key])
+
+    atlas = pygame.Surface((ATLAS_WIDTH, y + shelf_h), pygame.SRCALPHA)
+    for image, pos in placed:
+        atlas.blit(image.convert_alpha(), pos)
+
+    pygame.image.save(atlas, image_path)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    manifests.clear()
+
+    return len(placed)
+
+
+# CHECKED ONCE A RUN, HASHING THE SOURCE SHEETS IS NOT FREE
+manifests = {}
+
+
+def read_manifest(block_size, manifest_path=ATLAS_MANIFEST):
+    """Return the manifest, or None if it is missing or stale."""
+    key = (block_size, manifest_path)
+    if key not in manifests:
+        manifests[key] = check_manifest(block_size, manifest_path)
+    return manifests[key]
+
+
+def check_manifest(block_size, manifest_path):
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get('version') != ATLAS_VERSION or manifest.get('block_size') != block_size:
+        return None
+    if manifest.get('spec') != spec_hash(block_size):
+        return None
+    if not os.path.exists(manifest['image']):
+        return None
+
+    for sheet, digest in manifest['sources'].items():
+        if not os.path.exists(sheet) or file_hash(sheet) != digest:
+            return None
+    return manifest
+
+
+def images_needed(characters, block_size):
+    """(file, alpha) of the images load_frames() will read for characters,
+    the atlas or, while it is stale, the source sheets.
+    """
+    manifest = read_manifest(block_size)
+    if manifest is not None and all(character in manifest['characters'] for character in characters):
+        return [(manifest['image'], True)]
+    return [(CHARACTERS[character]['sheet'], False) for character in characters]
+
+
+# ONE SET OF FRAMES PER CHARACTER, SHARED BY EVERY INSTANCE
+loaded = {}
+
+
+def load_frames(character, block_size):
+    """Frames of a character from the atlas, or sliced live if it is stale."""
+    key = (character, block_size)
+    if key in loaded:
+        return loaded[key]
+
+    manifest = read_manifest(block_size)
+    if manifest is None or character not in manifest['characters']:
+        frames = slice_frames(character, block_size)
+    else:
+        atlas = surface_cache.load(manifest['image'], alpha=True)
+        frames = {}
+        for clip, sides in manifest['characters'][character].items():
+            frames[clip] = {side: [atlas.subsurface(rect) for rect in rects]
+                            for side, rects in sides.items()}
+
+    loaded[key] = frames
+    return frames
+
+
+if __name__ == '__main__':
+    block_size = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    pygame.display.init()
+    pygame.display.set_mode((1, 1), pygame.HIDDEN)
+    count = bake(block_size)
+    print(f"Baked {count} frames into {ATLAS_IMAGE} ({ATLAS_MANIFEST})")
@@ -0,0 +1,208 @@
+import argparse, json, os, platform, sys, tempfile, time, tracemalloc
+
+# NO WINDOW, NO SOUND, NO FRAME LIMIT
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+import main
+import map_design as levels
+from levelpack import LevelPack, compile_level
+from profiler import FrameProfiler
+from projectiles import SHURIKEN
+from spritesheet import SurfaceCache, surface_cache
+from replay import KeyState, encode
+
+
+# Times the parts of the game on generated levels of growing length, without
+# a display. Every frame is main.step() and main.draw(), the stages are the
+# ones they mark on the profiler. Results can be saved as a baseline and
+# later runs compared to it.
+#
+#   python bench.py --save bench_baseline.json
+#   python bench.py --compare bench_baseline.json
+#   python bench.py --columns 40 1000 --frames 300 --enemies 0.05
+#   python bench.py --projectiles 0
+
+SIZES = (40, 1000, 10000, 100000)
+STAGES = ('player', 'stream', 'enemies', 'projectiles', 'collide', 'background', 'level', 'sprites')
+
+# SHURIKENS ARE TOPPED UP IN RINGS OF RING_SIZE
+RING_SIZE = 64
+RING_SPEED = 4
+
+
+def percentile(values, q):
+    """q-th percentile of an already sorted list."""
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def summary(ms):
+    """Statistics of a list of timings in milliseconds."""
+    ms = sorted(ms)
+    return {'mean_ms': sum(ms) / max(len(ms), 1),
+            'p50_ms': percentile(ms, 50),
+            'p95_ms': percentile(ms, 95),
+            'max_ms': ms[-1] if ms else 0}
+
+
+class Pressed(dict):
+    """Keys not in the dict are up, like pygame.key.get_pressed()."""
+    def __missing__(self, key):
+        return False
+
+
+def bench_keys(frame):
+    """Run right the whole time, jump every 45 frames and hold the knife
+    key half the time.
+    """
+    keys = Pressed({pygame.K_RIGHT: True, pygame.K_UP: frame % 45 < 3, pygame.K_SPACE: frame % 24 < 12})
+    return KeyState(encode(keys))
+
+
+def bench_level(columns, frames, density, packed=False, flying=0):
+    layout = levels.generate_level(columns, **density)
+    spans = None
+
+    # A PACKED LEVEL IS TIMED FROM OPENING THE FILE
+    if packed:
+        path = os.path.join(tempfile.mkdtemp(), f'bench_{columns}.nlvl')
+        compile_level(path, *layout)
+
+    # ROOM FOR THE SHURIKENS KEPT IN THE AIR NEXT TO THE KNIVES
+    main.max_projectiles = max(flying + main.max_knives, main.max_projectiles)
+
+    # BUILD, THEN BUILD AGAIN UNDER tracemalloc FOR THE MEMORY
+    start = time.perf_counter()
+    if packed:
+        pack = LevelPack(path)
+        layout, spans = pack.layouts(), pack.spans
+    main.new_game(*layout, spans=spans)
+    build = time.perf_counter() - start
+
+    tracemalloc.start()
+    main.new_game(*layout, spans=spans)
+    python_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    layers = (main.level_1, main.level_1_P, main.level_1_E)
+    profiler = main.profiler = FrameProfiler(main.profiler.stages, size=max(frames, 1), enabled=True)
+    flown = 0
+
+    for frame in range(frames):
+        # KEEP flying SHURIKENS IN THE AIR, FROM THE MIDDLE OF THE SCREEN
+        while main.projectiles.count(SHURIKEN) < flying:
+            main.projectiles.ring(main.camera.x + main.screen_w / 2, main.screen_h / 3, RING_SIZE, RING_SPEED, frame)
+
+        profiler.begin_frame()
+        main.step(bench_keys(frame))
+        main.draw(1)
+        profiler.end_frame()
+        flown += main.projectiles.count()
+
+    chunk_bytes = sum(SurfaceCache.surface_bytes(chunk) for level in layers for chunk in level.chunks.values())
+
+    return {'stages': dict({'build': {'mean_ms': build * 1000}},
+                           **{stage: summary(profiler.recent(profiler.times[stage])) for stage in STAGES}),
+            'memory': {'python_peak_bytes': python_bytes,
+                       'chunk_bytes': chunk_bytes,
+                       'cache_bytes': surface_cache.bytes,
+                       'tile_bytes': sum(section.tiles.nbytes for level in layers for section in level.sections.values())},
+            'counts': {'tiles': sum(len(section.tiles) for level in layers for section in level.sections.values()),
+                       'sections': len(main.level_1.sections),
+                       'collision_rects': len(main.level_1.tile_grid.order),
+                       'enemies': len(main.level_1.enemies),
+                       'enemies_awake': int(main.level_1.enemies.awake.sum()),
+                       'projectiles_mean': flown / max(frames, 1),
+                       'frames': frames}}
+
+
+def run(sizes, frames, density, packed=False, flying=0):
+    main.init_display(headless=True)
+
+    results = {}
+    for columns in sizes:
+        results[str(columns)] = result = bench_level(columns, frames, density, packed, flying)
+        report(columns, result)
+
+    return {'meta': {'python': platform.python_version(),
+                     'pygame': pygame.version.ver,
+                     'machine': platform.machine(),
+                     'frames': frames,
+                     'density': density,
+                     'packed': packed,
+                     'projectiles': flying},
+            'results': results}
+
+
+def report(columns, result):
+    stages = result['stages']
+    memory = result['memory']
+    counts = result['counts']
+
+    print(f"{columns} columns: {counts['tiles']} tiles in {counts['sections']} sections, "
+          f"{counts['collision_rects']} collision rects, {counts['enemies']} enemies "
+          f"({counts['enemies_awake']} awake), "
+          f"{counts['projectiles_mean']:.0f} projectiles")
+    print(f"  {'build':11} {stages['build']['mean_ms']:10.2f} ms")
+    for stage in STAGES:
+        times = stages[stage]
+        print(f"  {stage:11} {times['mean_ms']:10.3f} ms mean {times['p95_ms']:8.3f} p95 {times['max_ms']:8.3f} max")
+    print(f"  memory      {memory['python_peak_bytes'] / 2**20:10.2f} MB python peak, "
+          f"{memory['tile_bytes'] / 2**20:.2f} MB tiles, {memory['chunk_bytes'] / 2**20:.2f} MB chunks, "
+          f"{memory['cache_bytes'] / 2**20:.2f} MB cached surfaces")
+
+
+def compare(baseline, current, tolerance):
+    """Print every stage that got slower or bigger than baseline by more
+    than tolerance. Returns the number of regressions.
+    """
+    regressions = 0
+    for columns, result in current['results'].items():
+        old = baseline['results'].get(columns)
+        if old is None:
+            continue
+
+        pairs = [(stage, old['stages'][stage]['mean_ms'], result['stages'][stage]['mean_ms'])
+                 for stage in result['stages'] if stage in old['stages']]
+        pairs += [(name, old['memory'][name], result['memory'][name])
+                  for name in result['memory'] if name in old['memory']]
+
+        for name, before, after in pairs:
+            # TINY NUMBERS ARE ALL NOISE
+            if after > before * (1 + tolerance) and after - before > 0.05:
+                print(f"REGRESSION {columns} columns {name}: {before:.3f} -> {after:.3f}")
+                regressions += 1
+
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the game on generated levels')
+    parser.add_argument('--columns', type=int, nargs='+', default=SIZES, help='level lengths to run')
+    parser.add_argument('--frames', type=int, default=600, help='frames simulated and drawn per level')
+    parser.add_argument('--platforms', type=float, default=0.04, help='chance of a platform per cell')
+    parser.add_argument('--plants', type=float, default=0.15, help='chance of a plant per column')
+    parser.add_argument('--enemies', type=float, default=0.02, help='chance of an enemy per column')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--packed', action='store_true', help='compile each level and load it from the pack file')
+    parser.add_argument('--projectiles', type=int, default=1000, metavar='N', help='shurikens kept in the air')
+    parser.add_argument('--save', metavar='FILE', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='FILE', help='fail if slower than a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown, 0.2 is 20%%')
+    args = parser.parse_args()
+
+    density = {'platforms': args.platforms, 'plants': args.plants, 'enemies': args.enemies, 'seed': args.seed}
+    current = run(args.columns, args.frames, density, args.packed, args.projectiles)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(current, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, current, args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,59 @@
+import pygame
+
+
+# CAMERA
+################################################################################
+class Camera:
+
+    def __init__(self, width, height):
+        """World-to-screen offset. Tiles and characters keep their world
+        position, only the camera moves when the screen scrolls.
+        x and y are where the simulation put the camera, draw_x and draw_y
+        are where the current frame is drawn from.
+        """
+        self.width = width
+        self.height = height
+
+        self.reset()
+
+
+    def scroll(self, dx, dy=0):
+        self.x += dx
+        self.y += dy
+
+
+    def reset(self):
+        self.x = 0
+        self.y = 0
+        self.begin_step()
+        self.interpolate(1)
+
+
+    def begin_step(self):
+        self.prev_x = self.x
+        self.prev_y = self.y
+
+
+    def interpolate(self, alpha):
+        """Draw from between the last two simulation steps."""
+        self.draw_x = round(self.prev_x + (self.x - self.prev_x) * alpha)
+        self.draw_y = round(self.prev_y + (self.y - self.prev_y) * alpha)
+
+
+    def apply(self, rect):
+        """Screen position of a world rect."""
+        return (rect[0] - self.draw_x, rect[1] - self.draw_y)
+
+
+    def to_screen_x(self, x):
+        return x - self.x
+
+
+    def bounds(self):
+        """The part of the world on screen after the last step."""
+        return pygame.Rect(self.x, self.y, self.width, self.height)
+
+
+    def view(self):
+        """The part of the world that is on screen."""
+        return pygame.Rect(self.draw_x, self.draw_y, self.width, self.height)
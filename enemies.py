@@ -0,0 +1,261 @@
+import numpy as np
+import pygame
+import animation
+from spatial import overlaps
+
+
+# PIXELS A STEP
+patrol_speed = 2
+
+# ENEMIES WAKE UP WITHIN wake_margin OF THE SCREEN AND ONLY FALL ASLEEP AGAIN
+# FURTHER THAN sleep_margin FROM IT. ASLEEP THEY MOVE ONCE EVERY coarse_every
+# STEPS, AS FAR AS THEY WOULD HAVE IN THAT MANY, AND FURTHER THAN
+# dormant_margin THEY STAND STILL
+wake_margin = 200
+sleep_margin = 400
+coarse_every = 4
+dormant_margin = 1000
+
+
+# ENEMIES
+################################################################################
+class Enemies:
+
+    def __init__(self, block_size, camera, screen):
+        """Every enemy of a level in flat arrays, patrolled and drawn all
+        at once. Enemies are added and dropped a section at a time, and
+        dropped when killed. Killed ones are not added again when their
+        section is, until restore() brings them back. All they keep of their animation is when it
+        started and which way they face, the run clip is shared.
+        Only enemies near the screen are awake and moved every step, the
+        ones further off take turns moving in bigger steps and the ones
+        far away are not moved at all.
+        """
+        self.camera = camera
+        self.screen = screen
+
+        clips = animation.load_clips('enemy', block_size)
+        self.run = clips['run', 'rt']
+
+        # RUN RIGHT, THEN RUN LEFT
+        self.images = clips['run', 'rt'].frames + clips['run', 'lt'].frames
+        self.masks = clips['run', 'rt'].masks + clips['run', 'lt'].masks
+        self.width, self.height = clips['idle', 'rt'].frames[0].get_size()
+
+        self.x = np.zeros(0, np.int64)
+        self.y = np.zeros(0, np.int64)
+        self.prev_x = np.zeros(0, np.int64)
+        self.prev_y = np.zeros(0, np.int64)
+        self.right = np.zeros(0, bool)
+        self.start = np.zeros(0)
+        self.section = np.zeros(0, np.int64)
+        self.spawn = np.zeros(0, np.int64)
+        self.awake = np.zeros(0, bool)
+        self.phase = np.zeros(0, np.int64)
+
+        # STEPS SO FAR AND ENEMIES EVER ADDED, FOR TAKING TURNS
+        self.steps = 0
+        self.added = 0
+        self.moved = 0
+
+        # (SECTION, SPAWN) OF EVERY ENEMY KILLED SINCE THE LAST restore()
+        self.killed = set()
+
+        self.drawn_rect = None
+        self.blitted = 0
+
+
+    def __len__(self):
+        return len(self.x)
+
+
+    def add(self, xs, ys, section, now):
+        """The enemies spawning at xs, ys in section, all facing right and
+        starting to run now. Spawns already killed are left out.
+        """
+        spawn = np.arange(len(xs))
+        alive = [index for index in spawn.tolist() if (section, index) not in self.killed]
+        spawn = spawn[alive]
+        xs = np.asarray(xs, np.int64).reshape(-1)[alive]
+        ys = np.asarray(ys, np.int64).reshape(-1)[alive]
+
+        count = len(xs)
+        self.x = np.concatenate((self.x, xs))
+        self.y = np.concatenate((self.y, ys))
+        self.prev_x = np.concatenate((self.prev_x, xs))
+        self.prev_y = np.concatenate((self.prev_y, ys))
+        self.right = np.concatenate((self.right, np.ones(count, bool)))
+        self.start = np.concatenate((self.start, np.full(count, float(now))))
+        self.section = np.concatenate((self.section, np.full(count, section, np.int64)))
+        self.spawn = np.concatenate((self.spawn, spawn))
+        self.awake = np.concatenate((self.awake, np.zeros(count, bool)))
+        self.phase = np.concatenate((self.phase, (self.added + np.arange(count)) % coarse_every))
+        self.added += count
+
+
+    def snapshot(self):
+        """Where every enemy is and which spawn of which section it is,
+        what restore() takes.
+        """
+        return self.x.copy(), self.y.copy(), self.section.copy(), self.spawn.copy()
+
+
+    def restore(self, saved, now):
+        """Just the enemies of a snapshot, all facing right and starting to
+        run now, like add() left them. Killed spawns can be added again.
+        """
+        x, y, section, spawn = saved
+        self.x = x.copy()
+        self.y = y.copy()
+        self.prev_x = x.copy()
+        self.prev_y = y.copy()
+        self.right = np.ones(len(x), bool)
+        self.start = np.full(len(x), float(now))
+        self.section = section.copy()
+        self.spawn = spawn.copy()
+        self.awake = np.zeros(len(x), bool)
+        self.phase = np.arange(len(x)) % coarse_every
+        self.added = len(x)
+        self.killed.clear()
+
+
+    def keep(self, mask):
+        for name in ('x', 'y', 'prev_x', 'prev_y', 'right', 'start', 'section', 'spawn', 'awake', 'phase'):
+            setattr(self, name, getattr(self, name)[mask])
+
+
+    def drop_section(self, section):
+        self.keep(self.section != section)
+
+
+    def kill(self, mask):
+        mask = np.asarray(mask, bool)
+        self.killed.update(zip(self.section[mask].tolist(), self.spawn[mask].tolist()))
+        self.keep(~mask)
+
+
+    def begin_step(self):
+        self.prev_x = self.x.copy()
+        self.prev_y = self.y.copy()
+
+
+    def edges(self):
+        """left, top, right, bottom arrays, like rect_arrays()."""
+        return self.x, self.y, self.x + self.width, self.y + self.height
+
+
+    def within(self, rect):
+        return overlaps(*self.edges(), (rect.left, rect.top, rect.right, rect.bottom))
+
+
+    def touching(self, rect, mask=None):
+        """Whether any enemy overlaps rect, like Rect.colliderect(). Given
+        the mask of what is drawn at rect, only enemies whose frame shares a
+        pixel with it count.
+        """
+        if mask is None:
+            return bool(self.within(rect).any())
+
+        rect = pygame.Rect(rect.topleft, mask.get_size())
+        near = np.flatnonzero(self.within(rect))
+        if not near.size:
+            return False
+
+        # MASKS ONLY FOR THE FEW WHOSE RECTS OVERLAP
+        masks = self.masks
+        for x, y, frame in zip(self.x[near].tolist(), self.y[near].tolist(), self.frames(near).tolist()):
+            if mask.overlap(masks[frame], (x - rect.x, y - rect.y)):
+                return True
+        return False
+
+
+    def masks_of(self, which):
+        """Masks of the frames the enemies in which show now, for Projectiles.hit()."""
+        masks = self.masks
+        return [masks[frame] for frame in self.frames(which).tolist()]
+
+
+    def frames(self, which=slice(None)):
+        """Which of images and masks each of the enemies shows now."""
+        run = self.run
+        elapsed = animation.clock.now - self.start[which]
+        return (elapsed // run.frame_ms).astype(np.int64) % len(run) + np.where(self.right[which], 0, len(run))
+
+
+    def wake(self, bounds):
+        """Wake the enemies within wake_margin of bounds and put those
+        further than sleep_margin from it to sleep.
+        """
+        near = bounds.inflate(2 * wake_margin, 2 * wake_margin)
+        far = bounds.inflate(2 * sleep_margin, 2 * sleep_margin)
+        self.awake = (self.awake & self.within(far)) | self.within(near)
+
+
+    def update(self, markers, solid):
+        """Move the enemies due this step. An enemy about to walk into a
+        turn-around marker or a solid tile turns around, markers and solid
+        are RectBands of them.
+        """
+        self.steps += 1
+        self.moved = 0
+        if not len(self.x):
+            return
+
+        bounds = self.camera.bounds()
+        self.wake(bounds)
+        turn = np.flatnonzero(~self.awake & ((self.steps + self.phase) % coarse_every == 0))
+        reach = bounds.inflate(2 * dormant_margin, 2 * dormant_margin)
+        turn = turn[(self.x[turn] < reach.right) & (self.x[turn] + self.width > reach.left)]
+        due = np.union1d(np.flatnonzero(self.awake), turn)
+        self.moved = due.size
+        if not due.size:
+            return
+
+        x = self.x[due]
+        y = self.y[due]
+        right = self.right[due]
+        speed = np.where(self.awake[due], patrol_speed, patrol_speed * coarse_every)
+
+        # MARKERS FIRST, THEN TILES, EACH LOOKED AT WITH THE STEP SO FAR
+        dx = np.where(right, speed, -speed)
+        for bands in (markers, solid):
+            left = x + dx
+            turn = bands.overlaps(left, y, left + self.width, y + self.height)
+            dx[turn] = -dx[turn]
+            right ^= turn
+
+        self.x[due] = x + dx
+        self.right[due] = right
+
+
+    def state(self):
+        return tuple(zip(self.x.tolist(), self.y.tolist(), self.right.tolist()))
+
+
+    def draw(self, alpha=1):
+        """The enemies on screen in one Surface.blits() call, part way
+        (alpha) between the last two steps.
+        """
+        view = self.camera.view()
+        x = np.rint(self.prev_x + (self.x - self.prev_x) * alpha).astype(np.int64)
+        y = np.rint(self.prev_y + (self.y - self.prev_y) * alpha).astype(np.int64)
+        visible = np.flatnonzero(overlaps(x, y, x + self.width, y + self.height,
+                                          (view.left, view.top, view.right, view.bottom)))
+
+        self.blitted = visible.size
+        if not visible.size:
+            self.drawn_rect = None
+            return
+
+        # ONE CLOCK READ FOR EVERY ENEMY'S FRAME
+        image = self.frames(visible)
+
+        x = x[visible] - view.x
+        y = y[visible] - view.y
+        images = self.images
+        self.screen.blits(list(zip([images[i] for i in image.tolist()],
+                                   zip(x.tolist(), y.tolist()))), doreturn=False)
+
+        left = int(x.min())
+        top = int(y.min())
+        self.drawn_rect = pygame.Rect(left, top, int(x.max()) + self.width - left, int(y.max()) + self.height - top)
@@ -0,0 +1,71 @@
+import argparse, hashlib, os, sys, time
+
+# NO WINDOW, NO SOUND, NO FRAME LIMIT
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import main
+from levelpack import LevelPack
+from replay import KeyState, load_inputs
+
+
+# Runs recorded input through the game logic as fast as possible, without
+# drawing. Every step's state goes into a SHA-256 digest (and optionally a
+# trace file), so two runs of the same input must print the same digest.
+#
+#   python main.py --record run.keys
+#   python headless.py run.keys --trace run.trace
+#   python headless.py run.keys --expect <digest>
+#
+# tests/test_headless.py replays tests/level_1.keys against its digest:
+#
+#   python -m pytest tests
+
+
+def simulate(inputs, trace=None, level=None):
+    """Run every input step, return the digest of the state trace.
+    level is a compiled level file to play instead of Level_1.
+    """
+    main.init_display(headless=True)
+    if level:
+        pack = LevelPack(level)
+        main.new_game(*pack.layouts(), spans=pack.spans)
+    else:
+        main.new_game()
+
+    digest = hashlib.sha256()
+    for tick, mask in enumerate(inputs):
+        main.step(KeyState(mask))
+
+        line = f"{tick} {main.state()}\n"
+        digest.update(line.encode())
+        if trace:
+            trace.write(line)
+
+    return digest.hexdigest()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay recorded input without a display')
+    parser.add_argument('inputs', help='file written by main.py --record')
+    parser.add_argument('--trace', metavar='FILE', help='write the state after every step')
+    parser.add_argument('--expect', metavar='DIGEST', help='fail unless the trace digest matches')
+    parser.add_argument('--level', metavar='FILE', help='level compiled by levelpack.py')
+    args = parser.parse_args()
+
+    inputs = load_inputs(args.inputs)
+    trace = open(args.trace, 'w') if args.trace else None
+
+    start = time.perf_counter()
+    digest = simulate(inputs, trace, args.level)
+    seconds = time.perf_counter() - start
+
+    if trace:
+        trace.close()
+
+    print(f"{len(inputs)} steps in {seconds:.3f}s ({len(inputs) / max(seconds, 1e-9):.0f} steps/s)")
+    print(digest)
+
+    if args.expect and args.expect != digest:
+        print(f"trace digest does not match {args.expect}")
+        sys.exit(1)
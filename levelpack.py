@@ -0,0 +1,133 @@
+import argparse, mmap, struct
+import numpy as np
+import map_design as levels
+from spatial import merge_spans
+
+
+# Compiled levels. One file holds the main, plant and enemy layers of a level
+# as one byte per cell, column after column, followed by the merged collision
+# spans of the full-block tiles. The game maps the file and reads cells
+# straight out of it, nothing is parsed.
+#
+#   python levelpack.py level_1.nlvl
+#   python levelpack.py long.nlvl --generate 100000
+#   python main.py --level level_1.nlvl
+
+MAGIC = b'NLVL'
+VERSION = 1
+
+# MAGIC, VERSION, ROWS, COLUMNS, LAYERS, SPANS
+HEADER = struct.Struct('<4sHHIHxxI')
+LAYERS = ('main', 'plants', 'enemy')
+
+# GROUND AND PILLARS FILL THEIR WHOLE CELL, SO THEY MERGE INTO SPANS
+FULL_BLOCKS = 'GpP'
+
+EMPTY = ord('0')
+
+
+def pad(layout, rows, columns):
+    rows_text = [row.ljust(columns, '0') for row in layout]
+    return rows_text + ['0' * columns] * (rows - len(rows_text))
+
+
+def compile_level(path, layout, plants, enemy_layout):
+    """Write the three layouts of a level to one pack file."""
+    rows = max(len(layout), len(plants), len(enemy_layout))
+    columns = max(len(row) for row in layout + plants + enemy_layout)
+
+    cells = [np.frombuffer(''.join(pad(grid, rows, columns)).encode('ascii'), np.uint8).reshape(rows, columns)
+             for grid in (layout, plants, enemy_layout)]
+
+    # SPANS IN CELLS: COLUMN, ROW, COLUMNS, ROWS
+    rows_at, cols_at = np.nonzero(np.isin(cells[0], [ord(char) for char in FULL_BLOCKS]))
+    spans = np.array([tuple(rect) for rect in merge_spans(cols_at.tolist(), rows_at.tolist(), 1)],
+                     np.uint32).reshape(-1, 4)
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, rows, columns, len(LAYERS), len(spans)))
+        for layer in cells:
+            # COLUMN AFTER COLUMN, SO A RUN OF COLUMNS IS ONE RUN OF BYTES
+            f.write(layer.T.tobytes())
+        f.write(bytes(-f.tell() % 4))
+        f.write(spans.tobytes())
+
+
+# LOADING
+################################################################################
+class PackedLayer:
+
+    def __init__(self, data, offset, rows, columns):
+        """One layer of a pack, read in place. len() is the number of rows,
+        like a list of layout strings.
+        """
+        self.rows = rows
+        self.columns = columns
+        self.data = np.frombuffer(data, np.uint8, rows * columns, offset).reshape(columns, rows)
+
+    def __len__(self):
+        return self.rows
+
+    def cells(self, col_1=0, col_2=None):
+        """Rows x columns array of character codes, a view of the file."""
+        return self.data[col_1:col_2].T
+
+
+class LevelPack:
+
+    def __init__(self, path):
+        """Map a compiled level. The file stays open while the pack is used."""
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, rows, columns, layer_count, span_count = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} level pack")
+
+        self.rows = rows
+        self.columns = columns
+
+        offset = HEADER.size
+        layers = []
+        for _ in range(layer_count):
+            layers.append(PackedLayer(self.map, offset, rows, columns))
+            offset += rows * columns
+        self.main, self.plants, self.enemy = layers
+
+        offset += -offset % 4
+        self.spans = np.frombuffer(self.map, np.uint32, span_count * 4, offset).reshape(span_count, 4)
+
+    def layouts(self):
+        """The layers in the order new_game() takes them."""
+        return self.main, self.plants, self.enemy
+
+
+def clip_spans(spans, col_1, col_2):
+    """(column, row, columns, rows) of the spans cut to the columns
+    col_1 up to col_2.
+    """
+    start = spans[:, 0].astype(np.int64)
+    end = start + spans[:, 2]
+    hit = (start < col_2) & (end > col_1)
+
+    left = np.maximum(start[hit], col_1)
+    right = np.minimum(end[hit], col_2)
+    return list(zip(left.tolist(), spans[hit, 1].tolist(), (right - left).tolist(), spans[hit, 3].tolist()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compile a level into a pack file')
+    parser.add_argument('output', help='pack file to write')
+    parser.add_argument('--generate', type=int, metavar='COLUMNS', help='compile a generated level instead of Level_1')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.generate:
+        layouts = levels.generate_level(args.generate, seed=args.seed)
+    else:
+        layouts = (levels.Level_1, levels.Level_1_plants, levels.level_1_enemy)
+
+    compile_level(args.output, *layouts)
+
+    pack = LevelPack(args.output)
+    print(f"{args.output}: {pack.rows} x {pack.columns} cells, {len(pack.spans)} spans")
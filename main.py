@@ -1,5 +1,19 @@
-import pygame, sys
+import pygame, sys, os, argparse
 import map_design as levels
+import animation
+import atlas
+from assets import AssetLoader
+from spritesheet import SpriteSheet
+from spatial import TileGrid, RectBands, merge_spans, rect_arrays
+from tiles import TileStore, SOLID, layout_cells, layout_columns, layout_positions
+from levelpack import LevelPack, FULL_BLOCKS, clip_spans
+from camera import Camera
+from render import DirtyRenderer, RenderQueue, BACKGROUND, LEVEL, ENEMIES, PLAYER, PROJECTILES
+from replay import InputRecorder, KeyState, load_inputs
+from profiler import FrameProfiler
+from projectiles import Projectiles, KNIFE
+from enemies import Enemies
+import parallax
 
 # SCREEN SETUP
 # SCREEN CONSTANTS
@@ -7,346 +21,119 @@ screen_w = 1000
 screen_h = 600
 block_size = 50
 
-FPS = 60
-
-screen = pygame.display.set_mode((screen_w, screen_h))
-
-pygame.display.set_caption('Ninja platformer')
-
-clock = pygame.time.Clock()
-
-
-# COLORS
-WHITE = (255, 255, 255)
-BLACK = (0,0,0)
-YELLOW = (242, 235, 31)
-GREEN = (31, 242, 137)
-RED = (255, 0, 0)
-
-
-# ninja numbers
-
-x_margin = 10
-y_margin = 11
-x_pad = 19
-y_pad = 17
-
-
-# SPRITE SHEET METHODS
-################################################################################
-class SpriteSheet:
-
-    def __init__(self, filename):
-        """Load the sheet."""
-        try:
-            self.sheet = pygame.image.load(filename).convert()
-        except pygame.error as e:
-            print(f"Unable to load spritesheet image: {filename}")
-            raise SystemExit(e)
-
-
-    def image_at(self, rectangle, colorkey=None):
-        """Load a specific image from a specific rectangle."""
-        """rectangle is a tuple with (x, y, x+offset, y+offset)"""
-        rect = pygame.Rect(rectangle)
-        image = pygame.Surface(rect.size).convert()
-        image.blit(self.sheet, (0, 0), rect)
-
-        if colorkey is not None:
-            if colorkey == -1:
-                colorkey = image.get_at((0, 0))
-            image.set_colorkey(colorkey, pygame.RLEACCEL)
-        return image
+# STATIC LEVEL GEOMETRY IS PRE-DRAWN IN SCREEN WIDE CHUNKS
+chunk_w = screen_w
+max_chunks = 6
 
+# LEVELS ARE MADE A SECTION OF COLUMNS AT A TIME AS THE CAMERA GETS CLOSE.
+# SECTIONS WITHIN load_ahead OF THE SCREEN ARE LOADED ONE A STEP, THOSE
+# FURTHER THAN release_after ARE LET GO
+section_w = chunk_w
+load_ahead = 2
+release_after = 4
 
-    def images_at(self, rects, colorkey=None):
-        """Load a whole bunch of images and return them as a list."""
-        return [self.image_at(rect, colorkey) for rect in rects]
-
-
-    def load_strip(self, rect, image_count, colorkey=None):
-        """Load a whole strip of images, and return them as a list."""
-        tups = [(rect[0] + rect[2] * x, rect[1], rect[2], rect[3])
-                for x in range(image_count)]
-        return self.images_at(tups, colorkey)
-
-
-    def load_grid_images(self, num_rows, num_cols, x_margin=0, x_padding=0, y_margin=0, y_padding=0, width = None, height = None, colorkey = None):
-        """Load a grid of images.
-        x_margin is the space between the top of the sheet and top of the first
-        row. x_padding is space between rows. Assumes symmetrical padding on
-        left and right.  Same reasoning for y. Calls self.images_at() to get a
-        list of images.
-        """
-
-        sheet_rect = self.sheet.get_rect()
-        sheet_width, sheet_height = sheet_rect.size
-
-        # To calculate the size of each sprite, subtract the two margins,
-        #   and the padding between each row, then divide by num_cols.
-        # Same reasoning for y.
-
-        if width and height:
-            x_sprite_size = width
-            y_sprite_size = height
-
-        else:
-            x_sprite_size = (sheet_width - 2 * x_margin
-                             - (num_cols - 1) * x_padding) / num_cols
-            y_sprite_size = (sheet_height - 2 * y_margin
-                             - (num_rows - 1) * y_padding) / num_rows
-
-        sprite_rects = []
-        for row_num in range(num_rows):
-            for col_num in range(num_cols):
-                # Position of sprite rect is margin + one sprite size
-                #   and one padding size for each row. Same for y.
-                x = x_margin + col_num * (x_sprite_size + x_padding)
-                y = y_margin + row_num * (y_sprite_size + y_padding)
-                sprite_rect = (x, y, x_sprite_size, y_sprite_size)
-                sprite_rects.append(sprite_rect)
-
-        return self.images_at(sprite_rects, colorkey)
-
-# ENEMY CLASS
-class Enemy(pygame.sprite.Sprite):
-    def __init__(self, picture_path, x, y, tile_set, enemy_layout):
-        super().__init__()
-        self.tile_set = tile_set
-        self.enemy_layout = enemy_layout
-        self.ninja_sheet = SpriteSheet(picture_path)
-
-        self.last = pygame.time.get_ticks()
-        self.image_delay = 100
-        self.current_frame = 0
-
-        self.right = True
-        self.left = False
-
-        self.vel = 0
-
-        self.ninja_idle_rt = self.ninja_sheet.image_at((62, 79, 196, 239), (0,0,0))
-        self.ninja_idle_rt = pygame.transform.scale(self.ninja_idle_rt, (block_size * 1.15, block_size * 1.25))
-        self.ninja_idle_lt = pygame.transform.flip(self.ninja_idle_rt, True, False)
-
-        self.image = self.ninja_idle_rt
-        self.rect = self.image.get_rect()
-
-        self.rect.x = x
-        self.rect.y = y
+# FRAMES DRAWN PER SECOND, THE GAME ITSELF ALWAYS STEPS AT SIM_HZ
+FPS = 60
+SIM_HZ = 60
+SIM_STEP = 1000 / SIM_HZ
+MAX_STEPS = 5
 
+# ONLY REDRAW WHAT MOVED, FOR SLOW MACHINES
+DIRTY_RECTS = False
 
-        # ANIMATIONS
-        self.ninja_run_rt_wrong = []
-        self.ninja_run_rt = []
+# TIMES EVERY STAGE OF A FRAME WHEN ENABLED, F3 SHOWS THE GRAPH
+profiler = FrameProfiler(('events', 'player', 'stream', 'enemies', 'projectiles', 'collide',
+                          'background', 'level', 'sprites', 'overlay', 'flip'))
 
-        # RUN
-        self.ninja_run_rt_1 = self.ninja_sheet.image_at((68, 1230, 190, 234), -1)
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_1)
+# AT MOST max_knives IN THE AIR, MOVING knife_speed EVERY STEP
+max_knives = 3
+knife_speed = 10
 
-        self.ninja_run_rt_2 = self.ninja_sheet.image_at((315, 1225, 191, 238), -1)
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_2)
+# SLOTS FOR EVERY KNIFE AND SHURIKEN IN FLIGHT
+max_projectiles = 2048
 
-        self.ninja_run_rt_3 = self.ninja_sheet.image_at((563, 1222, 191, 237), -1)
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_3)
+# WIDTH OF THE BANDS MARKERS AND SOLID TILES ARE LOOKED UP IN. ENEMIES AND
+# WHAT A PROJECTILE PASSES OVER IN ONE STEP ARE LOOKED UP FASTEST NARROWER
+band_w = 4 * block_size
 
-        self.ninja_run_rt_4 = self.ninja_sheet.image_at((804, 1225, 184, 236), -1)
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_4)
+# OPENED BY init_display()
+screen = None
 
-        self.ninja_run_rt_5 = self.ninja_sheet.image_at((1015, 1227, 176, 237), - 1)
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_5)
+# DECODES IMAGES ON WORKER THREADS WHEN PLAYING IN THE WINDOW
+loader = None
 
-        self.ninja_run_rt_6 = self.ninja_run_rt_5
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_6)
+# MILLISECONDS A FRAME MAY SPEND CONVERTING PREFETCHED IMAGES
+prefetch_budget = 1
 
-        self.ninja_run_rt_7 = self.ninja_sheet.image_at((1427, 1227, 179, 234), - 1)
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_7)
+clock = pygame.time.Clock()
 
-        self.ninja_run_rt_8 = self.ninja_run_rt_3
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_8)
+camera = Camera(screen_w, screen_h)
 
-        self.ninja_run_rt_9 = self.ninja_run_rt_2
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_9)
+# MILLISECONDS OF SIMULATED GAME TIME, ANIMATIONS RUN ON THIS
+sim_time = 0
 
-        self.ninja_run_rt_10 = self.ninja_run_rt_1
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_10)
 
-        for enemy in self.ninja_run_rt_wrong:
-            enemy = pygame.transform.scale(enemy, (block_size * 1.15, block_size * 1.25))
-            self.ninja_run_rt.append(enemy)
+def game_assets():
+    """(file, alpha) of every image new_game() loads."""
+    return atlas.images_needed(('player', 'enemy'), block_size) + [
+        ('Temple_spritesheet.png', False),
+        ('Japan_Gate.png', False),
+        ('SWORD_LT.png', True),
+        ('SWORD_RT.png', True),
+        ('shuriken pixel art.png', False)] + parallax.images_needed()
 
-        self.ninja_run_lt = [pygame.transform.flip(enemy, True, False) for enemy in self.ninja_run_rt]
 
+def init_display(headless=False):
+    """Open the game window, or an SDL dummy one when headless."""
+    global screen
 
-    def update(self, free_move, cam_right, collision):
-        keys = pygame.key.get_pressed()
-        now = pygame.time.get_ticks()
-        self.free_move = free_move
-        self.cam_right = cam_right
-        self.collision = collision
-
-        if not free_move:
-            if self.collision == False:
-                if keys[pygame.K_RIGHT]:
-                    self.vel = -5
-                    # self.rect.x -= 5
-
-                elif keys[pygame.K_LEFT]:
-                    self.vel = 5
-                    # self.rect.x += 5
-                else:
-                    self.vel = 0
-                    # self.rect.x += 0
-            else:
-                self.vel = 0
-        else:
-            self.vel = 0
+    if headless:
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
 
+    screen = pygame.display.set_mode((screen_w, screen_h))
 
-        if self.right:
-            dx = 2
+    pygame.display.set_caption('Ninja platformer')
+    return screen
 
-            if (now - self.last) >= self.image_delay:
-                self.last = now
 
-                if (self.current_frame + 1) < len(self.ninja_run_rt):
-                    self.current_frame += 1
-                else:
-                    self.current_frame = 0
-                self.image = self.ninja_run_rt[self.current_frame]
+# COLORS
+WHITE = (255, 255, 255)
+BLACK = (0,0,0)
+YELLOW = (242, 235, 31)
+GREEN = (31, 242, 137)
+RED = (255, 0, 0)
 
-        else:
-            dx = -2
-
-            if (now - self.last) >= self.image_delay:
-                self.last = now
-
-                if (self.current_frame + 1) < len(self.ninja_run_lt):
-                    self.current_frame += 1
-                else:
-                    self.current_frame = 0
-                self.image = self.ninja_run_lt[self.current_frame]
-
-
-        # COLLISION
-        for tile in self.enemy_layout:
-            if tile[1].colliderect(self.rect.x + dx, self.rect.y, self.rect.width, self.rect.height):
-                dx *= -1
-                if self.right:
-                    self.left = True
-                    self.right = False
-                else:
-                    self.left = False
-                    self.right = True
-
-        for tile in self.tile_set:
-            if tile[1].colliderect(self.rect.x + dx, self.rect.y, self.rect.width, self.rect.height):
-                dx *= -1
-                if self.right:
-                    self.left = True
-                    self.right = False
-                else:
-                    self.left = False
-                    self.right = True
-
-# UPDATE PLAYER AND DRAW
-        self.rect.x += dx
-        self.rect.x += self.vel
-        self.draw()
 
-    def kill_enemy(self):
-        self.rect.x = 1000000
+# ninja numbers
 
-    def draw(self):
-        screen.blit(self.image, self.rect)
+x_margin = 10
+y_margin = 11
+x_pad = 19
+y_pad = 17
 
 
-# THROWING KNIFE
-class sword(pygame.sprite.Sprite):
-    def __init__(self, x, y, right, tile_set, plant_set, screen):
-        super().__init__()
-        self.screen = screen
+def interpolate(prev, rect, alpha):
+    """Where to draw a rect between its last two simulation steps."""
+    return (round(prev[0] + (rect.x - prev[0]) * alpha),
+            round(prev[1] + (rect.y - prev[1]) * alpha))
 
-        # NINJA SWORD LEFT
-        self.sword_lt_img = 'SWORD_LT.png'
-        self.sword_lt = pygame.image.load(self.sword_lt_img).convert_alpha()
-        self.sword_lt = pygame.transform.scale(self.sword_lt, (40, 20))
 
-        #NINJA SWORD RIGHT
-        self.sword_rt_img = 'SWORD_RT.png'
-        self.sword_rt = pygame.image.load(self.sword_rt_img).convert_alpha()
-        self.sword_rt = pygame.transform.scale(self.sword_rt, (40, 20))
+# PLAYER CLASS
+class Player(pygame.sprite.Sprite):
+    def __init__(self, x, y, tile_grid):
+        self.tile_grid = tile_grid
 
-        self.image = self.sword_rt
+        # SHARED CLIPS, ALL A PLAYER KEEPS IS WHICH ONE AND SINCE WHEN
+        self.clips = animation.load_clips('player', block_size)
+        self.image = self.clips['idle', 'rt'].frames[0]
         self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.y = y + 30
-
-        self.sword_vel = 5
-
-        # TILE SET DEFINED
-        self.tile_set = tile_set
-        self.plant_set = plant_set
-
-        self.right = right
-
-        self.collide = False
-
-    def collisions(self):
-        for tile in self.tile_set:
-            if self.right:
-                if tile[1].colliderect(self.rect.x - self.rect.width / 2 + 20, self.rect.y, self.rect.width, self.rect.height):
-                    # print('COLLISION RIGHT')
-                    self.collide = True
-                    self.sword_vel = 0
-            else:
-                if tile[1].colliderect(self.rect.x + self.sword_vel, self.rect.y, self.rect.width, self.rect.height):
-                    # print('COLLISION LEFT')
-                    self.collide = True
-                    self.sword_vel = 0
-
-        return self.collide
-
-    def move_sword(self):
-        if self.right:
-            self.sword_vel = 5
-            self.image = self.sword_rt
-        else:
-            self.image = self.sword_lt
-            self.sword_vel = -5
-
-        self.collisions()
-
-        if self.collide == False:
-            self.rect.x += self.sword_vel
-            self.display_sword()
 
-        else:
-            self.kill_sword()
-
-        return self.collide
-
-    def kill_sword(self):
-        self.kill()
-
-    def display_sword(self):
-        self.screen.blit(self.image, (self.rect.x, self.rect.y))
+        self.reset(x, y)
 
 
-
-# PLAYER CLASS
-class Player(pygame.sprite.Sprite):
-    def __init__(self, picture_path, x, y, tile_set, plant_set, enemy_layout):
+    def reset(self, x, y):
+        """Stand still at x, y, the way the player starts a level."""
         self.collide = False
-        self.tile_set = tile_set
-        self.plant_set = plant_set
-        self.enemy_layout = enemy_layout
-
-        self.ninja_sheet = SpriteSheet(picture_path)
-
-        self.last = pygame.time.get_ticks()
-        self.image_delay = 100
-        self.current_frame = 0
 
         self.right = True
         self.left = False
@@ -361,165 +148,44 @@ class Player(pygame.sprite.Sprite):
         self.cam_right = False
         self.free_move = True
 
-        # IDLE
-        self.ninja_idle_rt = self.ninja_sheet.image_at((444, 49, 141, 229), -1)
-        self.ninja_idle_rt = pygame.transform.scale(self.ninja_idle_rt, (block_size * .9, block_size * 1.25))
-        self.ninja_idle_lt = pygame.transform.flip(self.ninja_idle_rt, True, False)
-
-        self.image = self.ninja_idle_rt
-        self.rect = self.image.get_rect()
+        self.clip = 'idle'
+        self.clip_start = animation.clock.now
+        self.image = self.clips['idle', 'rt'].frames[0]
 
         self.rect.x = x
         self.rect.y = y
+        self.begin_step()
 
         self.player_dead = False
 
-        # RUNNING ANIMATIONS
-        # self.ninja_run_rt_list_wrong = self.ninja_sheet.load_grid_images(1, 10, 450, 60, 1026, 0, 155, 228, -1)
-        self.ninja_run_rt_wrong = []
-        self.ninja_run_rt = []
-
-
-        # GET EACH RUN
-        self.ninja_run_rt_1 = self.ninja_sheet.image_at((450, 1026, 152, 221), -1)
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_1)
-
-        self.ninja_run_rt_2 = self.ninja_sheet.image_at((645, 795, 150, 222), -1)
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_2)
-
-        self.ninja_run_rt_3 = self.ninja_sheet.image_at((882, 1031, 142, 223), -1)
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_3)
-
-        self.ninja_run_rt_4 = self.ninja_sheet.image_at((1074, 1033, 138, 224), -1)
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_4)
-
-        self.ninja_run_rt_5 = self.ninja_sheet.image_at((1260, 1035, 139, 226), - 1)
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_5)
-
-        self.ninja_run_rt_6 = self.ninja_sheet.image_at((1431, 1034, 141, 228), - 1)
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_6)
-
-        self.ninja_run_rt_7 = self.ninja_sheet.image_at((1616, 1033, 139, 224), - 1)
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_7)
-
-        self.ninja_run_rt_8 = self.ninja_sheet.image_at((1809, 1032, 141, 224), - 1)
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_8)
-
-        self.ninja_run_rt_9 = self.ninja_sheet.image_at((1998, 1031, 141, 224), - 1)
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_9)
-
-        self.ninja_run_rt_10 = self.ninja_idle_rt
-        self.ninja_run_rt_wrong.append(self.ninja_run_rt_10)
-
-        for player in self.ninja_run_rt_wrong:
-            player = pygame.transform.scale(player, (block_size * .9, block_size * 1.25))
-            self.ninja_run_rt.append(player)
-
-        self.ninja_run_lt = [pygame.transform.flip(player, True, False) for player in self.ninja_run_rt]
-
-        # HITTING ANIMATIONS
-        self.ninja_hit_rt_wrong = self.ninja_sheet.load_grid_images(1, 10, 445, 56, 515, 0, 140, 222, -1)
-        self.ninja_hit_rt = []
-
-        self.ninja_hit_rt_1 = self.ninja_sheet.image_at((445, 547, 140, 222), -1)
-        self.ninja_hit_rt_wrong.append(self.ninja_hit_rt_1)
 
-        self.ninja_hit_rt_2 = self.ninja_sheet.image_at((639, 554, 161, 214), -1)
-        self.ninja_hit_rt_wrong.append(self.ninja_hit_rt_2)
-
-        self.ninja_hit_rt_3 = self.ninja_sheet.image_at((800, 555, 155, 210), -1)
-        self.ninja_hit_rt_wrong.append(self.ninja_hit_rt_3)
-
-        self.ninja_hit_rt_4 = self.ninja_sheet.image_at((990, 559, 173, 206), -1)
-        self.ninja_hit_rt_wrong.append(self.ninja_hit_rt_4)
-
-        self.ninja_hit_rt_5 = self.ninja_sheet.image_at((1181, 554, 179, 213), -1)
-        self.ninja_hit_rt_wrong.append(self.ninja_hit_rt_5)
-
-        self.ninja_hit_rt_6 = self.ninja_sheet.image_at((1379, 539, 149, 230), -1)
-        self.ninja_hit_rt_wrong.append(self.ninja_hit_rt_6)
-
-        self.ninja_hit_rt_7 = self.ninja_sheet.image_at((1579, 539, 147, 256), -1)
-        self.ninja_hit_rt_wrong.append(self.ninja_hit_rt_7)
-
-        self.ninja_hit_rt_8 = self.ninja_sheet.image_at((1757, 548, 146, 257), -1)
-        self.ninja_hit_rt_wrong.append(self.ninja_hit_rt_8)
-
-        self.ninja_hit_rt_9 = self.ninja_sheet.image_at((1949, 544, 132, 241), -1)
-        self.ninja_hit_rt_wrong.append(self.ninja_hit_rt_9)
-
-        self.ninja_hit_rt_10 = self.ninja_idle_rt
-        self.ninja_hit_rt_wrong.append(self.ninja_hit_rt_10)
-
-        for player in self.ninja_hit_rt_wrong:
-            player = pygame.transform.scale(player, (block_size * .95, block_size * 1.25))
-            self.ninja_hit_rt.append(player)
-
-        self.ninja_hit_lt = [pygame.transform.flip(player, True, False) for player in self.ninja_hit_rt]
-
-        # JUMPING ANIMATION
-        self.ninja_jump_rt_wrong = self.ninja_sheet.load_grid_images(1, 10, 437, 46, 1262, 0, 158, 213, -1)
-        self.ninja_jump_rt = []
-
-        self.ninja_jump_rt_1 = self.ninja_idle_rt
-        self.ninja_jump_rt_wrong.append(self.ninja_jump_rt_1)
-
-        self.ninja_jump_rt_2 = self.ninja_sheet.image_at((636, 1262, 159, 216), -1)
-        self.ninja_jump_rt_wrong.append(self.ninja_jump_rt_2)
-
-        self.ninja_jump_rt_3 = self.ninja_sheet.image_at((827, 1262, 168, 219), -1)
-        self.ninja_jump_rt_wrong.append(self.ninja_jump_rt_3)
-
-        self.ninja_jump_rt_4 = self.ninja_sheet.image_at((1031, 1265, 176, 218), -1)
-        self.ninja_jump_rt_wrong.append(self.ninja_jump_rt_4)
-
-        self.ninja_jump_rt_5 = self.ninja_sheet.image_at((1242, 1266, 176, 216), -1)
-        self.ninja_jump_rt_wrong.append(self.ninja_jump_rt_5)
-
-        self.ninja_jump_rt_6 = self.ninja_jump_rt_5
-        self.ninja_jump_rt_wrong.append(self.ninja_jump_rt_6)
-
-        self.ninja_jump_rt_7 = self.ninja_sheet.image_at((1631, 1265, 176, 215), -1)
-        self.ninja_jump_rt_wrong.append(self.ninja_jump_rt_7)
-
-        self.ninja_jump_rt_8 = self.ninja_sheet.image_at((1832, 1263, 170, 216), -1)
-        self.ninja_jump_rt_wrong.append(self.ninja_jump_rt_8)
-
-        self.ninja_jump_rt_9 = self.ninja_sheet.image_at((2042, 1263, 158, 216), -1)
-        self.ninja_jump_rt_wrong.append(self.ninja_jump_rt_9)
-
-        self.ninja_jump_rt_10 = self.ninja_idle_rt
-        self.ninja_jump_rt_wrong.append(self.ninja_jump_rt_10)
-
-        for player in self.ninja_jump_rt_wrong:
-            player = pygame.transform.scale(player, (block_size * .95, block_size * 1.25))
-            self.ninja_jump_rt.append(player)
-
-        self.ninja_jump_lt = [pygame.transform.flip(player, True, False) for player in self.ninja_jump_rt]
+    def begin_step(self):
+        self.prev_pos = self.rect.topleft
 
+    def play(self, clip):
+        """Play clip from its first frame, unless it is already playing.
+        In the air it holds still on the frame it got to.
+        """
+        if clip != self.clip:
+            self.clip = clip
+            self.clip_start = animation.clock.now
+        elif self.jumping:
+            self.clip_start += SIM_STEP
 
     def camera_move(self, dx):
+        # THE WORLD STAYS PUT, THE CAMERA TAKES THE PLAYER ALONG
+        camera.scroll(-1 * dx)
+        self.rect.x -= dx
 
-        for tile in self.plant_set:
-            tile[1].x += dx
-
-        for tile in self.tile_set:
-            if not tile[1].colliderect(self.rect.x + (-1 * dx), self.rect.y, self.rect.width, self.rect.height):
-                # print('HIT')
-                tile[1].x += dx
-
-        for tile in self.enemy_layout:
-            tile[1].x += dx
-
-    def update(self):
+    def update(self, keys):
         self.collide = False
 
         dx = 0
         dy = 0
 
-        keys = pygame.key.get_pressed()
+        screen_x = camera.to_screen_x(self.rect.x)
 
-        if self.rect.x > 200 and self.rect.x < screen_w - 200:
+        if screen_x > 200 and screen_x < screen_w - 200:
             self.free_move = True
 
         else:
@@ -532,37 +198,21 @@ class Player(pygame.sprite.Sprite):
                 self.cam_left = False
                 self.left = False
                 self.right = True
-                now = pygame.time.get_ticks()
                 dx = 5
+                self.play('run')
 
-                if (now - self.last) >= self.image_delay and self.jumping == False:
-                    self.last = now
-
-                    if (self.current_frame + 1) < len(self.ninja_run_rt):
-                        self.current_frame += 1
-                    else:
-                        self.current_frame = 0
-                    self.image = self.ninja_run_rt[self.current_frame]
 
-
-            elif self.rect.x >= screen_w - 200:
+            elif screen_x >= screen_w - 200:
                 self.free_move = False
                 self.cam_right = True
                 self.cam_left = False
                 dx = 0
-                now = pygame.time.get_ticks()
-                if (now - self.last) >= self.image_delay and self.jumping == False:
-                    self.last = now
-                    if (self.current_frame + 1) < len(self.ninja_run_rt):
-                        self.current_frame += 1
-                    else:
-                        self.current_frame = 0
-                    self.image = self.ninja_run_rt[self.current_frame]
+                self.play('run')
 
 
-            elif self.rect.x <= 200:
+            elif screen_x <= 200:
                 self.free_move = True
-                self.rect.x = 201
+                self.rect.x = camera.x + 201
 
 
             # RUN LEFT
@@ -573,49 +223,26 @@ class Player(pygame.sprite.Sprite):
                 self.left = True
                 self.right = False
                 dx = -5
-                now = pygame.time.get_ticks()
-
-                if (now - self.last) >= self.image_delay and self.jumping == False:
-                    self.last = now
-
-                    if (self.current_frame + 1) < len(self.ninja_run_lt):
-                        self.current_frame += 1
-                    else:
-                        self.current_frame = 0
-
-                    self.image = self.ninja_run_lt[self.current_frame]
+                self.play('run')
 
             # CHECK IF CAMERA MOVE OR NOT
-            elif self.rect.x <= 200:
+            elif screen_x <= 200:
                 self.free_move = False
                 self.cam_left = True
                 self.cam_right = False
 
                 dx = 0
-                now = pygame.time.get_ticks()
-                if (now - self.last) >= self.image_delay and self.jumping == False:
-                    self.last = now
-                    if (self.current_frame + 1) < len(self.ninja_run_lt):
-                        self.current_frame += 1
-                    else:
-                        self.current_frame = 0
-                    self.image = self.ninja_run_lt[self.current_frame]
+                self.play('run')
 
             # CHECK IF FREE MOVE
-            elif self.rect.x >= screen_w - 200:
+            elif screen_x >= screen_w - 200:
                 self.free_move = True
-                self.rect.x = screen_w - 201
+                self.rect.x = camera.x + screen_w - 201
 
         # IDLE
         else:
-            self.current_frame = 0
             dx = 0
-
-            if self.right:
-                self.image = self.ninja_idle_rt
-
-            elif self.left:
-                self.image = self.ninja_idle_lt
+            self.play('idle')
 
 
         # JUMPING MECHANIC
@@ -638,11 +265,10 @@ class Player(pygame.sprite.Sprite):
 
 # X COLLISION DETECTION
         if self.free_move:
-            for tile in self.tile_set:
-                if tile[1].colliderect(self.rect.x + dx, self.rect.y, self.rect.width, self.rect.height):
-                    dx = 0
+            if self.tile_grid.query((self.rect.x + dx, self.rect.y, self.rect.width, self.rect.height)):
+                dx = 0
         else:
-            for tile in self.tile_set:
+            for tile in self.tile_grid.query((self.rect.x - 5, self.rect.y, self.rect.width + 10, self.rect.height)):
                 if tile[1].colliderect(self.rect.x + 5, self.rect.y, self.rect.width, self.rect.height):
                     self.cam_right = False
                     self.collide = True
@@ -653,7 +279,7 @@ class Player(pygame.sprite.Sprite):
 
 
 # Y COLLISION DETECTION
-        for tile in self.tile_set:
+        for tile in self.tile_grid.query((self.rect.x, self.rect.y + dy, self.rect.width, self.rect.height)):
             if tile[1].colliderect(self.rect.x, self.rect.y + dy, self.rect.width, self.rect.height):
 
                 if self.y_vel < 0:
@@ -679,17 +305,20 @@ class Player(pygame.sprite.Sprite):
         self.rect.x += dx
         self.rect.y += dy
 
-        enemy.update(self.free_move, self.cam_right, self.collide)
-
-        self.draw()
-
 
-    def draw(self):
-        screen.blit(self.image, self.rect)
+    def draw(self, alpha=1):
+        clip = self.clips[self.clip, 'rt' if self.right else 'lt']
+        self.image = clip.frame(animation.clock.now - self.clip_start)
+        self.drawn_rect = queue[PLAYER].blit(self.image, camera.apply(interpolate(self.prev_pos, self.rect, alpha)))
         # pygame.draw.rect(screen, (255,255,255), self.rect, 2)
 
+    def mask(self):
+        """Collision mask of the frame the player shows now, at rect's top left."""
+        clip = self.clips[self.clip, 'rt' if self.right else 'lt']
+        return clip.mask(animation.clock.now - self.clip_start)
+
     def get_data(self):
-        return self.rect.x, self.rect.y, self.right, self.tile_set, self.plant_set
+        return self.rect.x, self.rect.y, self.right
 
 
 
@@ -697,186 +326,357 @@ class Player(pygame.sprite.Sprite):
 ############################## MAP LAYOUT ###############################
 #########################################################################
 
+# LAYOUT LETTER, SURFACE AND TAG OF EVERY KIND OF TILE
+TILE_KINDS = (('G', 'temple_ground', 'b'),
+              ('B', 'platform_big', 'b'),
+              ('p', 'pillar_bottom', 'b'),
+              ('P', 'pillar_top', 'b'),
+              ('S', 'platform_small', 'b'),
+              ('X', 'platform_xsmall', 'b'),
+              ('L', 'platform_long', 'b'),
+              ('d', 'gate', 'g'),
+              ('b', 'tree_big', 'p'),
+              ('s', 'tree_small', 'p'),
+              ('h', 'hedge_small', 'p'),
+              ('k', 'rectangle', 'e'))
+
+
 class Level:
-    def __init__(self, layout, block_size):
+    def __init__(self, layout, block_size, enemy_layout=None, spans=None):
         self.layout = layout
         self.block_size = block_size
 
-        self.tile_list = []
+        # COLLISION SPANS OF A COMPILED LEVEL, IN CELLS
+        self.spans = spans
+
+        self.enemies = Enemies(self.block_size, camera, queue[ENEMIES])
+
+        # LAYOUT OF THE ENEMY TURN-AROUND MARKERS ('k')
+        self.enemy_layout = enemy_layout if enemy_layout is not None else []
 
-        self.enemy_sheet = SpriteSheet('Ninja.png')
         self.temple_sheet = SpriteSheet('Temple_spritesheet.png')
         self.gate_sheet = SpriteSheet('Japan_Gate.png')
 
     # GAME OBJECTS
-        self.gate = self.gate_sheet.image_at((228, 372, 732, 541)).convert_alpha()
-        self.gate = pygame.transform.scale(self.gate, (self.block_size, self.block_size))
+        self.gate = self.gate_sheet.image_at((228, 372, 732, 541), scale=(self.block_size, self.block_size), alpha=True)
 
         # GROUND
-        self.temple_ground = self.temple_sheet.image_at((290, 480, 32, 32)).convert_alpha()
-        self.temple_ground = pygame.transform.scale(self.temple_ground, (self.block_size, self.block_size))
+        self.temple_ground = self.temple_sheet.image_at((290, 480, 32, 32), scale=(self.block_size, self.block_size), alpha=True)
 
         # PLANTS
-        self.tree_big = self.temple_sheet.image_at((396, 296, 107, 109)).convert_alpha()
-        self.tree_big = pygame.transform.scale(self.tree_big, (self.block_size * 2, self.block_size * 2))
+        self.tree_big = self.temple_sheet.image_at((396, 296, 107, 109), scale=(self.block_size * 2, self.block_size * 2), alpha=True)
 
-        self.tree_small = self.temple_sheet.image_at((430, 199, 71, 82), -1).convert_alpha()
-        self.tree_small = pygame.transform.scale(self.tree_small, (self.block_size * 1.5, self.block_size * 2))
+        self.tree_small = self.temple_sheet.image_at((430, 199, 71, 82), -1, (self.block_size * 1.5, self.block_size * 2), alpha=True)
 
-        self.hedge_small = self.temple_sheet.image_at((370, 268, 34, 20)).convert_alpha()
-        self.hedge_small = pygame.transform.scale(self.hedge_small, (self.block_size * 1.5, self.block_size))
+        self.hedge_small = self.temple_sheet.image_at((370, 268, 34, 20), scale=(self.block_size * 1.5, self.block_size), alpha=True)
 
         # TEMPLE PLATFORMS
-        self.platform_big = self.temple_sheet.image_at((256, 288, 64, 24)).convert_alpha()
-        self.platform_big = pygame.transform.scale(self.platform_big, (self.block_size * 2, self.block_size))
+        self.platform_big = self.temple_sheet.image_at((256, 288, 64, 24), scale=(self.block_size * 2, self.block_size), alpha=True)
 
-        self.platform_small = pygame.transform.scale(self.platform_big, (self.block_size, self.block_size / 1.5))
+        self.platform_small = self.temple_sheet.image_at((256, 288, 64, 24), scale=(self.block_size, self.block_size / 1.5), alpha=True)
 
-        self.platform_xsmall = pygame.transform.scale(self.platform_big, (self.block_size / 1.5, self.block_size / 1.5))
+        self.platform_xsmall = self.temple_sheet.image_at((256, 288, 64, 24), scale=(self.block_size / 1.5, self.block_size / 1.5), alpha=True)
 
-        self.platform_long = self.temple_sheet.image_at((0, 320, 255, 21)).convert_alpha()
-        self.platform_long = pygame.transform.scale(self.platform_long, (350, 30))
+        self.platform_long = self.temple_sheet.image_at((0, 320, 255, 21), scale=(350, 30), alpha=True)
 
         # TEMPLE WALLS
-        self.pillar_bottom = self.temple_sheet.image_at((225, 224, 31, 96)).convert_alpha()
-        self.pillar_bottom = pygame.transform.scale(self.pillar_bottom, (block_size, block_size))
+        self.pillar_bottom = self.temple_sheet.image_at((225, 224, 31, 96), scale=(block_size, block_size), alpha=True)
 
-        self.pillar_top = pygame.transform.flip(self.pillar_bottom, False, True)
+        self.pillar_top = self.temple_sheet.image_at((225, 224, 31, 96), scale=(block_size, block_size), flip=(False, True), alpha=True)
 
         self.rectangle = pygame.Surface((self.block_size, self.block_size))
         self.rectangle.fill((0, 0, 0))
 
-# MAKE THE LAYOUT
-        for i, row in enumerate(self.layout):
-            for j, col in enumerate(row):
-                x_val = j * self.block_size
-                y_val = i * self.block_size
-
-                if col == 'G':
-                    image_rect = self.temple_ground.get_rect()
-                    image_rect.x = x_val
-                    image_rect.y = y_val
-
-                    tile = (self.temple_ground, (image_rect), 'b')
-                    self.tile_list.append(tile)
-
-                elif col == 'B':
-                    image_rect = self.platform_big.get_rect()
-                    image_rect.x = x_val
-                    image_rect.y = y_val
-
-                    tile = (self.platform_big, (image_rect), 'b')
-                    self.tile_list.append(tile)
-
-                elif col == 'p':
-                    image_rect = self.pillar_bottom.get_rect()
-                    image_rect.x = x_val
-                    image_rect.y = y_val
-
-                    tile = (self.pillar_bottom, (image_rect), 'b')
-                    self.tile_list.append(tile)
-
-                elif col == 'P':
-                    image_rect = self.pillar_top.get_rect()
-                    image_rect.x = x_val
-                    image_rect.y = y_val
-
-                    tile = (self.pillar_top, (image_rect), 'b')
-                    self.tile_list.append(tile)
-
-                elif col == 'S':
-                    image_rect = self.platform_small.get_rect()
-                    image_rect.x = x_val
-                    image_rect.y = y_val
-
-                    tile = (self.platform_small, (image_rect), 'b')
-                    self.tile_list.append(tile)
-
-                elif col == 'X':
-                    image_rect = self.platform_xsmall.get_rect()
-                    image_rect.x = x_val
-                    image_rect.y = y_val
-
-                    tile = (self.platform_xsmall, (image_rect), 'b')
-                    self.tile_list.append(tile)
+        # ONE PALETTE ENTRY PER KIND OF TILE, THE TILES THEMSELVES ARE ARRAYS
+        self.kinds = TileStore()
+        self.codes = {char: self.kinds.add_kind(getattr(self, name), tag) for char, name, tag in TILE_KINDS}
+        self.widest = int(self.kinds.kind_w.max())
+
+        # COLLISION LOOKUP, FILLED AS SECTIONS ARE LOADED
+        self.tile_grid = TileGrid(self.block_size)
+        self.marker_grid = TileGrid(self.block_size, tags=('e',))
+
+        # TILES LOOKED AT AND TILES DRAWN LAST FRAME
+        self.tiles_considered = 0
+        self.tiles_blitted = 0
+
+        # THE LEVEL IS MADE A SECTION OF COLUMNS AT A TIME, AROUND THE CAMERA
+        self.section_cols = section_w // self.block_size
+        self.columns = layout_columns(self.layout)
+        self.section_count = -(-self.columns // self.section_cols)
+        self.sections = {}
+        self.pinned = set()
+        self.sections_loaded = 0
+        self.solid = None
+        self.patrol = None
+
+        self.stream(budget=None)
+
+        # THE PLAYER STARTS ON THE LAST N OF THE WHOLE LAYOUT, WITH THE
+        # SECTION IT STANDS IN LOADED
+        self.ninja = None
+        self.start = None
+        starts = layout_positions(layout_cells(self.layout), 'N', self.block_size)
+        if starts:
+            self.start = starts[-1]
+            self.section(self.start[0] // section_w)
+            self.ninja = Player(*self.start, self.tile_grid)
+
+        # WHAT reset_level() PUTS BACK
+        self.initial = (list(self.sections), self.enemies.snapshot())
+
+        # BAKE THE CHUNKS ON THE FIRST SCREEN, THE REST WHEN SCROLLED TO
+        self.chunked = True
+        self.chunks = {}
+        self.chunks_blitted = 0
+        self.built = False
+
+        for index in self.chunks_in(camera.view()):
+            self.build_chunk(index)
 
-                elif col == 'L':
-                    image_rect = self.platform_long.get_rect()
-                    image_rect.x = x_val
-                    image_rect.y = y_val
 
-                    tile = (self.platform_long, (image_rect), 'b')
-                    self.tile_list.append(tile)
-
-                elif col =='d':
-                    image_rect = self.gate.get_rect()
-                    image_rect.x = x_val
-                    image_rect.y = y_val
-
-                    tile = (self.gate, (image_rect), 'g')
-                    self.tile_list.append(tile)
-
-                if col == 'b':
-                    image_rect = self.tree_big.get_rect()
-                    image_rect.x = x_val
-                    image_rect.y = y_val
-
-                    tile = (self.tree_big, (image_rect), 'p')
-                    self.tile_list.append(tile)
-
-                elif col == 's':
-                    image_rect = self.tree_small.get_rect()
-                    image_rect.x = x_val
-                    image_rect.y = y_val
+    def get_layout(self):
+        return([tile for section in self.sections.values() for tile in section.tiles.tuples()])
+    # def get_plants(self):
+    #     return(self.plant_list)
+    # def get_enemy_layout(self):
+    #     return(self.enemy_layout)
 
-                    tile = (self.tree_small, (image_rect), 'p')
-                    self.tile_list.append(tile)
+    def get_characters(self):
+        return(self.ninja, self.enemies)
 
-                elif col == 'h':
-                    image_rect = self.hedge_small.get_rect()
-                    image_rect.x = x_val
-                    image_rect.y = y_val
+    # SECTIONS
+    def stream(self, budget=1):
+        """Load the sections on screen now and up to budget more of the
+        ones within load_ahead of it, nearest first. Sections further than
+        release_after away are let go. budget=None loads them all.
+        """
+        first = int(camera.x // section_w)
+        last = int((camera.x + screen_w - 1) // section_w)
+
+        for index in range(first, last + 1):
+            if 0 <= index < self.section_count and index not in self.sections:
+                self.load_section(index)
+
+        ahead = [index for index in range(first - load_ahead, last + load_ahead + 1)
+                 if 0 <= index < self.section_count and index not in self.sections]
+        ahead.sort(key=lambda index: min(abs(index - first), abs(index - last)))
+        for index in ahead[:budget]:
+            self.load_section(index)
+
+        for index in list(self.sections):
+            if (index < first - release_after or index > last + release_after) and index not in self.pinned:
+                self.release_section(index)
+
+    def load_section(self, index):
+        """Make the tiles, collision, markers and enemies of one section."""
+        col_1 = index * self.section_cols
+        col_2 = col_1 + self.section_cols
+        x_val = col_1 * self.block_size
+
+        section = LevelSection(index, col_1, col_2, TileStore(self.kinds))
+        self.sections[index] = section
+        self.sections_loaded += 1
+
+        cells = layout_cells(self.layout, col_1, col_2)
+        section.tiles.add_cells(cells, self.codes, self.block_size, x_val)
+        self.build_collision(section)
+
+        # TURN-AROUND MARKERS OF THE ENEMY LAYER
+        markers = layout_cells(self.enemy_layout, col_1, col_2)
+        for x, y in layout_positions(markers, 'k', self.block_size):
+            tile = (self.rectangle, pygame.Rect(x + x_val, y, self.block_size, self.block_size), 'e')
+            section.markers.append(tile)
+            self.marker_grid.insert(tile)
+        self.patrol = None
+
+        spawns = layout_positions(cells, 'E', self.block_size)
+        self.enemies.add([x + x_val for x, y in spawns], [y - 13 for x, y in spawns], index, sim_time)
+
+        return section
+
+    def release_section(self, index):
+        """Forget a section. Its enemies come back if it is loaded again,
+        all but the ones killed.
+        """
+        section = self.sections.pop(index)
+        self.solid = None
+        self.patrol = None
+        for tile in section.collision:
+            self.tile_grid.remove(tile)
+        for tile in section.markers:
+            self.marker_grid.remove(tile)
+        self.enemies.drop_section(index)
+
+    def section(self, index):
+        section = self.sections.get(index)
+        if section is None:
+            section = self.load_section(index)
+        return section
+
+    def build_collision(self, section):
+        """Fill tile_grid with merged spans of the section's full-block
+        tiles (ground and pillars) and its other solid tiles as they are.
+        A compiled level has the spans already, unless tiles were changed.
+        """
+        for tile in section.collision:
+            self.tile_grid.remove(tile)
 
-                    tile = (self.hedge_small, (image_rect), 'p')
-                    self.tile_list.append(tile)
+        tiles = section.tiles
+        blocks = tiles.mask(SOLID, [self.codes[char] for char in FULL_BLOCKS])
+        others = tiles.mask(SOLID) & ~blocks
 
-                if col == 'k':
-                    image_rect = self.rectangle.get_rect()
-                    image_rect.x = x_val
-                    image_rect.y = y_val
+        size = self.block_size
+        if self.spans is not None and section.index not in self.pinned:
+            spans = [pygame.Rect(col * size, row * size, cols * size, rows * size)
+                     for col, row, cols, rows in clip_spans(self.spans, section.col_1, section.col_2)]
+        else:
+            spans = merge_spans(tiles.x[blocks].tolist(), tiles.y[blocks].tolist(), size)
+        section.collision = [(None, rect, 'b') for rect in spans] + tiles.tuples(others)
 
-                    tile = (self.rectangle, (image_rect), 'e')
-                    self.tile_list.append(tile)
+        self.tile_grid.insert_all(section.collision)
+        self.solid = None
+        self.patrol = None
 
-                elif col == 'N':
-                    self.ninja = Player('SamuraiLight.png', x_val, y_val, self.tile_list, self.plant_list, self.enemy_layout)
-                    # self.ninja_rect.x = x_val
-                    # self.ninja_rect.y = y_val
-                    # tile = (self.ninja, (self.ninja_rect))
-                    # self.tile_list.append(tile)
+    def solid_rects(self):
+        """The collision of the loaded sections as rect_arrays(), for
+        testing many boxes at once. Made again after sections change.
+        """
+        if self.solid is None:
+            self.solid = rect_arrays([tile[1] for section in self.sections.values() for tile in section.collision])
+        return self.solid
 
-                elif col == 'E':
-                    self.enemy = Enemy('Ninja.png', x_val, y_val - 13, self.tile_list, self.enemy_layout)
-                    # self.enemy_rect.x = x_val
-                    # self.enemy_rect.y = y_val
-                    # tile = (self.enemy, (self.enemy_rect))
-                    # self.tile_list.append(tile)
+    def patrol_index(self):
+        """RectBands of the loaded markers and of the solid tiles, what
+        the enemies turn around at.
+        """
+        if self.patrol is None:
+            markers = rect_arrays([tile[1] for section in self.sections.values() for tile in section.markers])
+            self.patrol = (RectBands(markers, band_w), RectBands(self.solid_rects(), band_w))
+        return self.patrol
+
+    def solid_index(self):
+        """RectBands of the solid tiles, the same table the enemies use."""
+        return self.patrol_index()[1]
+
+    def sections_in(self, rect):
+        """Sections holding tiles that can overlap rect."""
+        first = (rect[0] - self.widest) // section_w
+        last = (rect[0] + rect[2] - 1) // section_w
+        return range(max(first, 0), min(last, self.section_count - 1) + 1)
+
+    def tiles_in(self, rect):
+        """(surface, x, y) of the tiles overlapping rect, in layout order.
+        Sections that are not loaded yet are loaded first.
+        """
+        placed = []
+        for index in self.sections_in(rect):
+            tiles = self.section(index).tiles
+            placed += tiles.placed(tiles.overlapping(rect))
+
+        # ROW BY ROW ACROSS THE SECTIONS, LIKE READING THE LAYOUT
+        placed.sort(key=lambda tile: (tile[2], tile[1]))
+        return placed
+
+    # CHUNKS
+    def chunks_in(self, rect):
+        return range(rect.left // chunk_w, (rect.right - 1) // chunk_w + 1)
+
+    def build_chunk(self, index):
+        """Draw every tile touching one chunk onto a single surface."""
+        chunk_rect = pygame.Rect(index * chunk_w, 0, chunk_w, len(self.layout) * self.block_size)
+        placed = self.tiles_in(chunk_rect)
+        height = max([chunk_rect.height] + [y + surface.get_height() for surface, x, y in placed])
+
+        # ONE MORE ROW THAN THE TILES NEED, IT STAYS TRANSPARENT
+        chunk = pygame.Surface((chunk_w, height + 1), pygame.SRCALPHA)
+        for surface, x, y in placed:
+            chunk.blit(surface, (x - chunk_rect.x, y))
+
+        # RLE SKIPS THE EMPTY SPACE BETWEEN TILES WHEN BLITTING
+        chunk.set_alpha(255, pygame.RLEACCEL)
+        self.chunks[index] = chunk
+        return chunk
+
+    def invalidate(self, rect=None):
+        """Throw away the chunks under rect, or all of them."""
+        if rect is None:
+            self.chunks.clear()
+        else:
+            for index in self.chunks_in(rect):
+                self.chunks.pop(index, None)
 
+    def add_tile(self, char, x, y):
+        """Put a tile of the kind char stands for in the layout at x, y.
+        Returns what remove_tile() takes. A section with added or removed
+        tiles is never released.
+        """
+        section_index = x // section_w
+        section = self.section(section_index)
+        index = section.tiles.append(self.codes[char], x, y)
+        self.pinned.add(section_index)
 
+        self.build_collision(section)
+        self.invalidate(section.tiles.rect(index))
+        return section_index, index
 
-    def get_layout(self):
-        return(self.tile_list)
-    # def get_plants(self):
-    #     return(self.plant_list)
-    # def get_enemy_layout(self):
-    #     return(self.enemy_layout)
+    def remove_tile(self, tile):
+        section_index, index = tile
+        section = self.section(section_index)
+        section.tiles.remove(index)
+        self.pinned.add(section_index)
 
-    def get_characters(self):
-        return(self.ninja, self.enemy)
+        self.build_collision(section)
+        self.invalidate(section.tiles.rect(index))
 
     def draw(self):
-        for tile in self.tile_list:
-            screen.blit(tile[0], tile[1])
+        if not self.chunked:
+            self.draw_tiles()
+            return
+
+        visible = self.chunks_in(camera.view())
+        self.chunks_blitted = 0
+        self.built = False
+
+        for index in visible:
+            chunk = self.chunks.get(index)
+            if chunk is None:
+                chunk = self.build_chunk(index)
+                self.built = True
+            queue[LEVEL].blit(chunk, camera.apply((index * chunk_w, 0)))
+            self.chunks_blitted += 1
+
+        # FORGET CHUNKS FAR AWAY ONCE THERE ARE TOO MANY
+        if len(self.chunks) > max_chunks:
+            for index in sorted(self.chunks, key=lambda i: abs(i - visible.start), reverse=True):
+                if len(self.chunks) <= max_chunks:
+                    break
+                if index not in visible:
+                    del self.chunks[index]
+
+    def prebake(self):
+        """Build the chunk just off either side of the screen, if it is
+        not built yet. Returns True if one was built.
+        """
+        visible = self.chunks_in(camera.view())
+        for index in (visible.stop, visible.start - 1):
+            if 0 <= index * chunk_w < self.columns * self.block_size and index not in self.chunks:
+                chunk = self.build_chunk(index)
+
+                # THE RLE ENCODING IS DONE ON THE FIRST BLIT TO THE SCREEN, SO
+                # DO IT NOW WITH THE ONE PIXEL THAT IS ALWAYS TRANSPARENT
+                screen.blit(chunk, (0, 0), (0, chunk.get_height() - 1, 1, 1))
+                return True
+        return False
+
+    def draw_tiles(self):
+        # ONLY TILES ON SCREEN, FOUND IN ONE PASS OVER EACH SECTION
+        view = camera.view()
+        visible = self.tiles_in(view)
+        self.tiles_considered = sum(len(self.sections[index].tiles) for index in self.sections_in(view))
+        self.tiles_blitted = len(visible)
+
+        queue[LEVEL].blits([(surface, (x - view.x, y - view.y)) for surface, x, y in visible], doreturn=False)
 
     # def draw_plants(self):
     #     for tile in self.plant_list:
@@ -887,7 +687,58 @@ class Level:
     #         screen.blit(tile[0], tile[1])
 
     def reset_level(self):
-        self.__init__(self.layout, self.block_size)
+        """Put the level back the way it started, with the camera back at
+        the start. Sections loaded since are let go and edited ones are
+        made again from the layout, the rest are kept along with the
+        palette, the baked chunks and the player.
+        """
+        order, enemies = self.initial
+
+        changed = bool(self.pinned)
+        if self.pinned:
+            self.invalidate()
+        for index in list(self.sections):
+            if index not in order or index in self.pinned:
+                self.release_section(index)
+                changed = True
+        self.pinned.clear()
+
+        for index in order:
+            if index not in self.sections:
+                self.load_section(index)
+                changed = True
+
+        # COLLISION IN THE ORDER A NEW LEVEL HAS IT, QUERIES RETURN IT IN THAT ORDER
+        if changed:
+            self.sections = {index: self.sections[index] for index in order}
+            self.tile_grid.clear()
+            self.marker_grid.clear()
+            for section in self.sections.values():
+                self.tile_grid.insert_all(section.collision)
+                self.marker_grid.insert_all(section.markers)
+            self.solid = None
+            self.patrol = None
+
+        self.enemies.restore(enemies, sim_time)
+        if self.ninja is not None:
+            self.ninja.reset(*self.start)
+
+        for index in self.chunks_in(camera.view()):
+            if index not in self.chunks:
+                self.build_chunk(index)
+
+
+class LevelSection:
+    def __init__(self, index, col_1, col_2, tiles):
+        """The tiles of columns col_1 up to col_2 of a level and what was
+        made from them.
+        """
+        self.index = index
+        self.col_1 = col_1
+        self.col_2 = col_2
+        self.tiles = tiles
+        self.collision = []
+        self.markers = []
 
 
 def draw_grid(width, height, size):
@@ -898,104 +749,254 @@ def draw_grid(width, height, size):
             pygame.draw.rect(screen, BLACK, rect, 2)
 
 
-level_1 = Level(levels.Level_1, block_size)
-level_1_layout = level_1.get_layout()
+def new_game(layout=levels.Level_1, plants=levels.Level_1_plants, enemy_layout=levels.level_1_enemy, spans=None):
+    """Build the level and everything in it, ready for step(). The
+    layouts are lists of strings or the layers of a LevelPack.
+    """
+    global level_1, level_1_P, level_1_E, ninja, enemies, background, projectiles, renderer, queue
+    global cooldown_tracker, sim_time
 
-level_1_P = Level(levels.Level_1_plants, block_size)
-level_1_plants = level_1_P.get_layout()
+    sim_time = 0
+    animation.clock.tick(sim_time)
+    camera.reset()
 
-level_1_E = Level(levels.level_1_enemy, block_size)
-level_1_enemy = level_1_E.get_layout()
+    # EVERY BLIT OF A FRAME GOES THROUGH THE QUEUE, IN LAYER ORDER
+    queue = RenderQueue(screen)
 
-ninja, enemy = level_1.get_characters()
+    level_1_P = Level(plants, block_size)
 
-################## IMAGES #######################
-# GAME BACKGROUND
-moon_bg = 'Moon-Mountain-BG.png'
-moon_bg = pygame.image.load(moon_bg).convert_alpha()
+    level_1_E = Level(enemy_layout, block_size)
 
-sword_group = pygame.sprite.Group()
+    level_1 = Level(layout, block_size, enemy_layout, spans)
 
-enemy_group = pygame.sprite.Group()
-enemy_group.add(enemy)
-###################################################################################
+    ninja, enemies = level_1.get_characters()
 
+    ################## IMAGES #######################
+    # GAME BACKGROUND
+    background = parallax.Parallax(screen_w, screen_h)
 
-shooting = False
-knife_total = 0
+    projectiles = Projectiles(max_projectiles, camera, queue[PROJECTILES])
 
-cooldown_tracker = 0
+    renderer = DirtyRenderer(screen, camera)
+    ###################################################################################
 
-# MAIN LOOP
-while True:
-    counter = 0
-    keys = pygame.key.get_pressed()
 
-    for event in pygame.event.get():
-        player_run_current = pygame.time.get_ticks()
+    cooldown_tracker = 0
+
 
+def state():
+    """Everything a step depends on, written out by headless replays."""
+    return (sim_time, camera.x,
+            ninja.rect.x, ninja.rect.y, ninja.y_vel, ninja.jumping, ninja.falling, ninja.right, ninja.clip, ninja.clip_start,
+            enemies.state(),
+            projectiles.count(), cooldown_tracker,
+            projectiles.state())
 
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
 
-    screen.blit(moon_bg, (0,0))
+def step(keys):
+    """Advance the game by one fixed SIM_STEP."""
+    global sim_time, cooldown_tracker, ninja, enemies
 
-    # draw_grid(screen_w, screen_h, block_size)
+    sim_time += SIM_STEP
+    animation.clock.tick(sim_time)
 
-    level_1.draw()
-    level_1_P.draw()
-    level_1_E.draw()
+    camera.begin_step()
+    ninja.begin_step()
+    enemies.begin_step()
+    projectiles.begin_step()
 
-    ninja.update()
+    ninja.update(keys)
+    profiler.mark('player')
 
+    level_1.stream()
+    level_1_P.stream()
+    level_1_E.stream()
+    profiler.mark('stream')
+    enemies.update(*level_1.patrol_index())
+    profiler.mark('enemies')
 
-    cooldown_tracker += clock.get_time()
+    cooldown_tracker += SIM_STEP
 
     if cooldown_tracker > 200:
         cooldown_tracker = 0
 
-    if keys[pygame.K_SPACE] and cooldown_tracker == 0:
-        shooting = True
-        if knife_total >= 3:
-            knife_max = True
+    if keys[pygame.K_SPACE] and cooldown_tracker == 0 and projectiles.count(KNIFE) < max_knives:
+        x, y, right = ninja.get_data()
+        projectiles.spawn(KNIFE, x, y + 30, knife_speed if right else -knife_speed, 0)
 
-        else:
-            knife_total += 1
-            knife_max = False
-
-        if knife_max == False:
-            x, y, right, tile_set, plant_set = ninja.get_data()
-            throwing_sword = sword(x, y, right, tile_set, plant_set, screen)
-            sword_group.add(throwing_sword)
-            # throwing_sword.move_sword()
-
-    if shooting:
-        x = 0
-        for knife in sword_group.sprites():
-            knife.move_sword()
-
-            if knife.move_sword() == True:
-                if knife_total >= 0:
-                    knife_total -= 1
-
-            if enemy.image_rect.colliderect(knife.image_rect.x, knife.image_rect.y, knife.image_rect.width, knife.image_rect.height):
-                # print('HIT ENEMY')
-                knife.kill_sword()
-                enemy.kill_enemy()
-            x += 1
-        if x == 0:
-            knife_total = 0
+    # PROJECTILES ARE GONE A BLOCK OFF SCREEN
+    projectiles.update(level_1.solid_index(), camera.bounds().inflate(2 * block_size, 2 * block_size))
+
+    hit = projectiles.hit(enemies.edges(), enemies.masks_of)
+    if hit.any():
+        # print('HIT ENEMY')
+        enemies.kill(hit)
+    profiler.mark('projectiles')
 
     # PLAYER DETECTION WITH ENEMY
     # if enemy.image_rect.colliderect(ninja.image_rect.x, ninja.image_rect.y, ninja.image_rect.width, ninja.image_rect.height):
-    if pygame.sprite.spritecollide(ninja, enemy_group, True):
+    if enemies.touching(ninja.rect, ninja.mask()):
+        camera.reset()
         level_1.reset_level()
         level_1_P.reset_level()
         level_1_E.reset_level()
 
+        ninja, enemies = level_1.get_characters()
+    profiler.mark('collide')
+
+
+def draw_levels():
+    """Draw the three level layers. On frames where none of them had to
+    build a chunk, one chunk about to come on screen is built ahead.
+    """
+    layers = (level_1, level_1_P, level_1_E)
+    for level in layers:
+        level.draw()
+
+    if not any(level.chunked and level.built for level in layers):
+        for level in layers:
+            if level.chunked and level.prebake():
+                break
+
+
+def draw(alpha):
+    """Draw the game part way (alpha) between the last two steps."""
+    camera.interpolate(alpha)
+
+    if not DIRTY_RECTS or renderer.begin():
+        background.draw(queue[BACKGROUND], camera.draw_x)
+        profiler.mark('background')
+
+        # draw_grid(screen_w, screen_h, block_size)
+
+        draw_levels()
+        queue.flush()
+
+        if DIRTY_RECTS:
+            renderer.save_background()
+        profiler.mark('level')
+
+    enemies.draw(alpha)
+    ninja.draw(alpha)
+    projectiles.draw(alpha)
+    queue.flush()
+    profiler.mark('sprites')
+
     # screen.blit(E_run, (500, 220))
 
-    pygame.display.flip()
-    clock.tick(FPS)
+    profiler.draw(screen, 1000 / FPS)
+    profiler.mark('overlay')
+
+    if DIRTY_RECTS:
+        sprites = [ninja]
+        if enemies.drawn_rect:
+            sprites.append(enemies)
+        if projectiles.drawn_rect:
+            sprites.append(projectiles)
+        if profiler.drawn_rect:
+            sprites.append(profiler)
+        renderer.present(sprites)
+    else:
+        pygame.display.flip()
+    profiler.mark('flip')
+
+
+def loading_screen(loader):
+    """Show a progress bar until everything loader was asked for is ready."""
+    bar = pygame.Rect(0, 0, screen_w // 2, 20)
+    bar.center = (screen_w // 2, screen_h // 2)
+
+    while not loader.pump():
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                quit_game()
+
+        screen.fill(BLACK)
+        screen.fill(WHITE, (bar.x, bar.y, int(bar.width * loader.progress()), bar.height))
+        pygame.draw.rect(screen, WHITE, bar, 2)
+        pygame.display.flip()
+        loader.wait(1 / FPS)
+
+
+# MAIN LOOP
+def quit_game(recorder=None, record=None, profile_out=None):
+    if recorder:
+        recorder.save(record)
+    if profile_out:
+        profiler.dump(profile_out)
+    pygame.quit()
+    sys.exit()
+
+
+def run(record=None, replay=None, profile_out=None):
+    """Play in the window. record saves the keys of every step to a
+    file, replay plays a recorded file back instead of the keyboard.
+    profile_out gets the profiler's frames on exit.
+    """
+    recorder = InputRecorder() if record else None
+    inputs = iter(load_inputs(replay)) if replay else None
+    accumulator = 0
+
+    while True:
+        profiler.begin_frame()
+        keys = pygame.key.get_pressed()
 
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                quit_game(recorder, record, profile_out)
+
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler.overlay = not profiler.overlay
+                profiler.drawn_rect = None
+                renderer.background_pos = None
+
+        # IMAGES PREFETCHED FOR LATER, A FEW AT A TIME
+        if loader and loader.queued:
+            loader.pump(prefetch_budget)
+        profiler.mark('events')
+
+        # RUN AS MANY STEPS AS THE TIME THAT PASSED, THEN DRAW ONCE
+        accumulator += min(clock.get_time(), MAX_STEPS * SIM_STEP)
+
+        while accumulator >= SIM_STEP:
+            if inputs is not None:
+                mask = next(inputs, None)
+                if mask is None:
+                    quit_game(recorder, record, profile_out)
+                keys = KeyState(mask)
+            if recorder:
+                recorder.record(keys)
+
+            step(keys)
+            accumulator -= SIM_STEP
+
+        draw(accumulator / SIM_STEP)
+        profiler.end_frame()
+
+        clock.tick(FPS)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ninja platformer')
+    parser.add_argument('--record', metavar='FILE', help='save the keys pressed on every step')
+    parser.add_argument('--replay', metavar='FILE', help='play back recorded keys')
+    parser.add_argument('--level', metavar='FILE', help='play a level compiled by levelpack.py')
+    parser.add_argument('--profile', action='store_true', help='time every frame and show the graph')
+    parser.add_argument('--profile-out', metavar='FILE', help='save the frame times as .json or .csv on exit')
+    args = parser.parse_args()
+
+    profiler.enabled = args.profile or bool(args.profile_out)
+    profiler.overlay = args.profile
+
+    # DECODING STARTS BEFORE THE WINDOW IS EVEN OPEN
+    loader = AssetLoader()
+    loader.request(game_assets())
+
+    init_display()
+    loading_screen(loader)
+    if args.level:
+        pack = LevelPack(args.level)
+        new_game(*pack.layouts(), spans=pack.spans)
+    else:
+        new_game()
+    run(args.record, args.replay, args.profile_out)
@@ -1,3 +1,5 @@
+import random
+
 # 20 x 12 (really 20 x 10 because of first two ground layers)
 
 
@@ -39,4 +41,66 @@ level_1_enemy =             ['0000000000000000000000000000000000000000',
                              '0000000000000000000000000000000000000000',
                              '0000000000000000000000000000000000000000',
                              '0000000000000000000000000000000000000000',
-                             '0000000000000000000000000000000000000000']
\ No newline at end of file
+                             '0000000000000000000000000000000000000000']
+
+# GENERATED LEVELS
+################################################################################
+# Same format as Level_1, any number of columns. Densities are the chance of
+# a cell getting a platform, or a column getting a plant or an enemy.
+
+PLATFORMS = 'SSSSBBXXL'
+PLANTS_TALL = 'bs'
+PLANTS_LOW = 'h'
+
+
+def generate_level(columns, rows=12, platforms=0.04, plants=0.15, enemies=0.02, seed=0):
+    """Returns (layout, plants layout, enemy layout) like Level_1,
+    Level_1_plants and level_1_enemy.
+    """
+    rand = random.Random(seed)
+
+    layout = [['0'] * columns for _ in range(rows)]
+    plant_layout = [['0'] * columns for _ in range(rows)]
+    enemy_layout = [['0'] * columns for _ in range(rows)]
+
+    ground = rows - 1
+    floor = rows - 2
+
+    # PILLARS ON BOTH ENDS, GROUND ALONG THE BOTTOM
+    for row in range(ground):
+        layout[row][0] = layout[row][-1] = 'p' if row % 2 == 0 else 'P'
+    layout[ground] = ['G'] * columns
+
+    # PLATFORMS, NOT IN THE TWO ROWS ABOVE THE GROUND WHERE THINGS WALK
+    for row in range(2, floor - 1):
+        for col in range(2, columns - 2):
+            if rand.random() < platforms:
+                layout[row][col] = rand.choice(PLATFORMS)
+
+    # PLANTS STAND ON THE GROUND
+    for col in range(1, columns - 2):
+        if rand.random() < plants:
+            if rand.random() < 0.5:
+                plant_layout[floor - 1][col] = rand.choice(PLANTS_TALL)
+            else:
+                plant_layout[floor][col] = PLANTS_LOW
+
+    # ENEMIES PATROL BETWEEN TWO MARKERS, AWAY FROM THE PLAYER'S START.
+    # THERE IS ALWAYS ONE, THE GAME NEEDS AN ENEMY
+    col = 12
+    while col < columns - 6:
+        if col == 12 or rand.random() < enemies:
+            layout[floor][col] = 'E'
+            enemy_layout[floor][col - 3] = 'k'
+            enemy_layout[floor][col + 3] = 'k'
+            col += 7
+        else:
+            col += 1
+
+    layout[floor][3] = 'N'
+    if columns > 8:
+        layout[2][1] = 'd'
+
+    return ([''.join(row) for row in layout],
+            [''.join(row) for row in plant_layout],
+            [''.join(row) for row in enemy_layout])
@@ -0,0 +1,83 @@
+import pygame
+from spritesheet import surface_cache
+
+
+# Parallax background. Every layer is loaded once, scaled to the height of the
+# screen and laid side by side into a strip one copy wider than the screen,
+# so wherever a layer has scrolled to a single blit covers the screen. A layer
+# only keeps the rows it draws on that no layer in front of it covers.
+
+PACK = 'parallax_mountain_pack/layers/'
+
+# FILE, HOW FAR IT SCROLLS FOR EACH PIXEL THE CAMERA DOES AND WHETHER IT HAS
+# SEE THROUGH PARTS, BACK TO FRONT. SEE THROUGH PARTS MUST BE FULLY CLEAR
+LAYERS = (('Moon.png', 0, False),
+          ('Mountain.png', 0.1, True),
+          ('Small_Mountains.png', 0.2, True),
+          (PACK + 'parallax-mountain-trees.png', 0.4, True),
+          (PACK + 'parallax-mountain-foreground-trees.png', 0.6, True))
+
+# STANDS IN FOR THE CLEAR PARTS OF A STRIP, NO LAYER USES IT
+KEY = (255, 0, 255)
+
+
+def images_needed(layers=LAYERS):
+    """(file, alpha) of every layer, as surface_cache.load() takes them."""
+    return [(filename, alpha) for filename, factor, alpha in layers]
+
+
+def opaque_rows(image):
+    """The first row anything is drawn on and the row from which every
+    row down is solid.
+    """
+    alpha = pygame.surfarray.pixels_alpha(image)
+    drawn = alpha.any(axis=0).nonzero()[0]
+    holes = (alpha < 255).any(axis=0).nonzero()[0]
+    del alpha
+    top = int(drawn[0]) if drawn.size else image.get_height()
+    return top, int(holes[-1]) + 1 if holes.size else 0
+
+
+# PARALLAX BACKGROUND
+################################################################################
+class Parallax:
+
+    def __init__(self, width, height, layers=LAYERS, cache=surface_cache):
+        """The layers, made ready to cover a width x height screen."""
+        self.layers = []
+
+        # FRONT TO BACK, EACH LAYER STOPS WHERE THE ONES IN FRONT COVER IT
+        covered = height
+        for filename, factor, alpha in reversed(layers):
+            image = cache.load(filename, alpha)
+            tile = pygame.transform.scale(image, (round(image.get_width() * height / image.get_height()), height))
+
+            top, solid = opaque_rows(tile) if alpha else (0, 0)
+            bottom = covered
+            covered = min(covered, solid)
+            if bottom <= top:
+                continue
+            tile = tile.subsurface(0, top, tile.get_width(), bottom - top)
+
+            # ENOUGH COPIES TO COVER THE SCREEN FROM ANYWHERE IN THE FIRST ONE.
+            # CLEAR PARTS BECOME A COLORKEY, RLE SKIPS THEM WHEN BLITTING
+            tile_w = tile.get_width()
+            copies = -(-width // tile_w) + 1
+            strip = pygame.Surface((tile_w * copies, tile.get_height())).convert()
+            if alpha:
+                strip.fill(KEY)
+            for copy in range(copies):
+                strip.blit(tile, (copy * tile_w, 0))
+            if alpha:
+                strip.set_colorkey(KEY, pygame.RLEACCEL)
+
+            # RLE IS MADE ON THE FIRST BLIT, NOT IN THE MIDDLE OF A FRAME
+            pygame.Surface((1, 1)).blit(strip, (0, 0))
+
+            self.layers.insert(0, (strip, tile_w, factor, top))
+
+
+    def draw(self, screen, camera_x):
+        """Every layer, scrolled to match a camera at camera_x."""
+        for strip, tile_w, factor, y in self.layers:
+            screen.blit(strip, (-(round(camera_x * factor) % tile_w), y))
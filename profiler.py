@@ -0,0 +1,144 @@
+import csv, json, time
+from array import array
+import pygame
+
+
+# FRAME PROFILER
+################################################################################
+class FrameProfiler:
+
+    def __init__(self, stages, size=600, enabled=False):
+        """Times the stages of the last size frames in a ring buffer.
+        mark(stage) charges the time since the previous mark to stage, so
+        marks go after each piece of work. While disabled every call
+        returns straight away.
+        """
+        self.stages = tuple(stages)
+        self.size = size
+        self.enabled = enabled
+        self.overlay = False
+
+        # ONE ROW OF MILLISECONDS PER STAGE, PLUS THE WHOLE FRAME
+        self.times = {stage: array('d', bytes(8 * size)) for stage in self.stages}
+        self.frame_times = array('d', bytes(8 * size))
+        self.frames = 0
+
+        self.current = dict.fromkeys(self.stages, 0.0)
+        self.frame_start = 0
+        self.last = 0
+
+        self.font = None
+        self.text = None
+        self.drawn_rect = None
+
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.frame_start = self.last = time.perf_counter()
+        for stage in self.current:
+            self.current[stage] = 0.0
+
+
+    def mark(self, stage):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.current[stage] += now - self.last
+        self.last = now
+
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        slot = self.frames % self.size
+        for stage, seconds in self.current.items():
+            self.times[stage][slot] = seconds * 1000
+        self.frame_times[slot] = (time.perf_counter() - self.frame_start) * 1000
+        self.frames += 1
+
+
+    def recent(self, row):
+        """The filled part of a ring buffer row, oldest frame first."""
+        if self.frames < self.size:
+            return list(row[:self.frames])
+        slot = self.frames % self.size
+        return list(row[slot:]) + list(row[:slot])
+
+
+    def summary(self):
+        frame_times = sorted(self.recent(self.frame_times))
+        if not frame_times:
+            return {}
+
+        def percentile(q):
+            return frame_times[min(len(frame_times) - 1, int(q / 100 * len(frame_times)))]
+
+        return {'frames': len(frame_times),
+                'p50_ms': percentile(50), 'p95_ms': percentile(95), 'p99_ms': percentile(99),
+                'max_ms': frame_times[-1],
+                'stages_mean_ms': {stage: sum(self.recent(self.times[stage])) / len(frame_times)
+                                   for stage in self.stages}}
+
+
+    def dump(self, path):
+        """Write the buffered frames to a .csv file, or JSON otherwise."""
+        rows = [self.recent(self.times[stage]) for stage in self.stages]
+        frame_times = self.recent(self.frame_times)
+        first = self.frames - len(frame_times)
+
+        if path.endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(('frame',) + self.stages + ('total',))
+                for i, total in enumerate(frame_times):
+                    writer.writerow([first + i] + [round(row[i], 4) for row in rows] + [round(total, 4)])
+        else:
+            with open(path, 'w') as f:
+                json.dump({'summary': self.summary(),
+                           'first_frame': first,
+                           'stages': dict(zip(self.stages, rows)),
+                           'total': frame_times}, f)
+
+
+    # OVERLAY
+    ############################################################################
+    def draw(self, screen, budget_ms, width=300, height=60):
+        """Frame time graph with the budget line and percentiles, top left."""
+        if not (self.enabled and self.overlay):
+            return
+
+        if self.font is None:
+            pygame.font.init()
+            self.font = pygame.font.Font(None, 18)
+
+        # TEXT ONLY CHANGES TWICE A SECOND, RENDERING IT IS NOT FREE
+        if self.text is None or self.frames % 30 == 0:
+            stats = self.summary()
+            lines = []
+            if stats:
+                lines.append(f"p50 {stats['p50_ms']:.1f}  p95 {stats['p95_ms']:.1f}  "
+                             f"p99 {stats['p99_ms']:.1f}  max {stats['max_ms']:.1f} ms")
+                lines += [f"{stage} {ms:.2f}" for stage, ms in stats['stages_mean_ms'].items()]
+            self.text = [self.font.render(line, True, (255, 255, 255)) for line in lines]
+
+        text_height = sum(line.get_height() for line in self.text)
+        panel = pygame.Rect(0, 0, width, height + text_height + 4)
+        screen.fill((0, 0, 0), panel)
+
+        # ONE PIXEL WIDE BAR PER FRAME, SCALED SO TWO BUDGETS FIT
+        frame_times = self.recent(self.frame_times)[-width:]
+        scale = height / (2 * budget_ms)
+        for x, ms in enumerate(frame_times):
+            bar = min(height, int(ms * scale))
+            color = (31, 242, 137) if ms <= budget_ms else (255, 0, 0)
+            screen.fill(color, (x, height - bar, 1, bar))
+        budget_y = height - int(budget_ms * scale)
+        screen.fill((242, 235, 31), (0, budget_y, width, 1))
+
+        y = height + 2
+        for line in self.text:
+            screen.blit(line, (2, y))
+            y += line.get_height()
+
+        self.drawn_rect = panel
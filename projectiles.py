@@ -0,0 +1,227 @@
+import math
+import numpy as np
+import pygame
+from spritesheet import SpriteSheet, surface_cache
+from spatial import overlaps
+
+
+KNIFE = 0
+SHURIKEN = 1
+
+# HIT BOX OF EACH KIND
+SIZES = ((40, 20), (20, 20))
+
+# SHURIKENS SPIN THROUGH SPIN_FRAMES TURNED COPIES, SPIN_STEPS STEPS EACH
+SPIN_FRAMES = 4
+SPIN_STEPS = 3
+
+
+# PROJECTILES
+################################################################################
+class Projectiles:
+
+    def __init__(self, capacity, camera, screen):
+        """Every knife and shuriken in flight, kept in arrays of capacity
+        slots and moved, hit tested and drawn all at once. A slot is free
+        again as soon as its projectile hits something or leaves bounds.
+        """
+        self.capacity = capacity
+        self.camera = camera
+        self.screen = screen
+
+        self.alive = np.zeros(capacity, bool)
+        self.kind = np.zeros(capacity, np.uint8)
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        self.prev_x = np.zeros(capacity)
+        self.prev_y = np.zeros(capacity)
+        self.age = np.zeros(capacity, np.int32)
+
+        self.kind_w = np.array([size[0] for size in SIZES])
+        self.kind_h = np.array([size[1] for size in SIZES])
+
+        # IMAGES: KNIFE RIGHT, KNIFE LEFT, THEN THE SHURIKEN SPIN
+        knife_rt = pygame.transform.scale(surface_cache.load('SWORD_RT.png', alpha=True), SIZES[KNIFE])
+        knife_lt = pygame.transform.scale(surface_cache.load('SWORD_LT.png', alpha=True), SIZES[KNIFE])
+        shuriken = SpriteSheet('shuriken pixel art.png').image_at((0, 0, 21, 21), -1, SIZES[SHURIKEN], alpha=True)
+        spin = [pygame.transform.rotate(shuriken, 90 * frame / SPIN_FRAMES) for frame in range(SPIN_FRAMES)]
+
+        self.images = [knife_rt, knife_lt] + spin
+
+        # TURNED COPIES ARE BIGGER, KEEP THEM CENTRED ON THE HIT BOX
+        self.offset_x = np.array([(image.get_width() - SIZES[SHURIKEN][0]) // 2 if i >= 2 else 0
+                                  for i, image in enumerate(self.images)])
+        self.offset_y = np.array([(image.get_height() - SIZES[SHURIKEN][1]) // 2 if i >= 2 else 0
+                                  for i, image in enumerate(self.images)])
+        self.image_w = np.array([image.get_width() for image in self.images])
+        self.image_h = np.array([image.get_height() for image in self.images])
+        self.masks = [pygame.mask.from_surface(image) for image in self.images]
+
+        # HOW FAR PAST ITS HIT BOX ANY IMAGE OF EACH KIND REACHES LEFT, UP,
+        # RIGHT AND DOWN
+        image_kind = np.array([KNIFE, KNIFE] + [SHURIKEN] * SPIN_FRAMES)
+        edges = (self.offset_x, self.offset_y, self.image_w - self.offset_x, self.image_h - self.offset_y)
+        reach = np.array([[edge[image_kind == kind].max() for edge in edges] for kind in (KNIFE, SHURIKEN)])
+        self.reach_left, self.reach_top, self.reach_right, self.reach_bottom = reach.T.copy()
+
+        self.drawn_rect = None
+        self.blitted = 0
+
+
+    def count(self, kind=None):
+        if kind is None:
+            return int(np.count_nonzero(self.alive))
+        return int(np.count_nonzero(self.alive & (self.kind == kind)))
+
+
+    def spawn(self, kind, x, y, vx, vy):
+        """Launch projectiles from x, y with velocity vx, vy in pixels per
+        step. Any of them can be arrays. Returns how many were launched,
+        fewer than asked when the slots run out.
+        """
+        x, y, vx, vy = np.broadcast_arrays(*(np.asarray(value, np.float64) for value in (x, y, vx, vy)))
+        slots = np.flatnonzero(~self.alive)[:x.size]
+        count = slots.size
+
+        self.alive[slots] = True
+        self.kind[slots] = kind
+        self.x[slots] = self.prev_x[slots] = x.ravel()[:count]
+        self.y[slots] = self.prev_y[slots] = y.ravel()[:count]
+        self.vx[slots] = vx.ravel()[:count]
+        self.vy[slots] = vy.ravel()[:count]
+        self.age[slots] = 0
+        return count
+
+
+    def ring(self, x, y, count, speed, turn=0):
+        """count shurikens flying out evenly from x, y."""
+        angles = turn + np.arange(count) * (2 * math.pi / count)
+        return self.spawn(SHURIKEN, x, y, np.cos(angles) * speed, np.sin(angles) * speed)
+
+
+    def fan(self, x, y, count, speed, direction, spread):
+        """count shurikens spread over spread radians around direction."""
+        angles = direction + np.linspace(-spread / 2, spread / 2, count)
+        return self.spawn(SHURIKEN, x, y, np.cos(angles) * speed, np.sin(angles) * speed)
+
+
+    def begin_step(self):
+        self.prev_x[:] = self.x
+        self.prev_y[:] = self.y
+
+
+    def update(self, solid, bounds):
+        """Move everything one step. A projectile whose path this step
+        crosses one of the rects of solid, a RectBands, or that ends outside
+        bounds is gone.
+        """
+        live = np.flatnonzero(self.alive)
+        if not live.size:
+            return
+
+        x = self.x[live]
+        y = self.y[live]
+        next_x = x + self.vx[live]
+        next_y = y + self.vy[live]
+        kind = self.kind[live]
+
+        width = self.kind_w[kind]
+        height = self.kind_h[kind]
+        dead = ((next_x + width <= bounds.left) | (next_x >= bounds.right) |
+                (next_y + height <= bounds.top) | (next_y >= bounds.bottom))
+
+        # EVERYTHING THE HIT BOX PASSES OVER ON THE WAY
+        left = np.minimum(x, next_x)
+        top = np.minimum(y, next_y)
+        right = np.maximum(x, next_x) + width
+        bottom = np.maximum(y, next_y) + height
+        dead |= solid.overlaps(left, top, right, bottom)
+
+        self.alive[live[dead]] = False
+
+        moving = live[~dead]
+        self.x[moving] = next_x[~dead]
+        self.y[moving] = next_y[~dead]
+        self.age[moving] += 1
+
+
+    def hit(self, rects, masks=None):
+        """Projectiles touching any of rects, given like rect_arrays(), are
+        gone. Returns a bool array of which rects were hit. masks, if given,
+        takes an array of rect numbers and returns the masks drawn at their
+        top left corners, then a projectile has to share a pixel with one.
+        """
+        live = np.flatnonzero(self.alive)
+        if not live.size or not len(rects[0]):
+            return np.zeros(len(rects[0]), bool)
+
+        x = self.x[live]
+        y = self.y[live]
+        kind = self.kind[live]
+        if masks is None:
+            # (PROJECTILES x RECTS)
+            touching = overlaps(x[:, None], y[:, None], (x + self.kind_w[kind])[:, None],
+                                (y + self.kind_h[kind])[:, None], rects)
+        else:
+            # RECTS AROUND EVERY IMAGE A PROJECTILE COULD SHOW FIRST, MASKS OF
+            # THE ONE IT SHOWS ONLY WHERE THOSE OVERLAP
+            touching = overlaps((x - self.reach_left[kind])[:, None], (y - self.reach_top[kind])[:, None],
+                                (x + self.reach_right[kind])[:, None], (y + self.reach_bottom[kind])[:, None], rects)
+            slot, rect = touching.nonzero()
+            if slot.size:
+                image = self.frames(live[slot])
+                left = (x[slot] - self.offset_x[image]).tolist()
+                top = (y[slot] - self.offset_y[image]).tolist()
+
+                own = self.masks
+                touching[slot, rect] = [own[frame].overlap(other, (round(rect_x - x_val), round(rect_y - y_val))) is not None
+                                        for frame, other, x_val, y_val, rect_x, rect_y in
+                                        zip(image.tolist(), masks(rect), left, top, rects[0][rect].tolist(), rects[1][rect].tolist())]
+
+        self.alive[live[touching.any(axis=1)]] = False
+        return touching.any(axis=0)
+
+
+    def state(self):
+        live = np.flatnonzero(self.alive)
+        return tuple(zip(self.kind[live].tolist(), self.x[live].tolist(), self.y[live].tolist()))
+
+
+    def frames(self, slots):
+        """Which of images and masks each of slots shows. Knives face the
+        way they fly, shurikens spin.
+        """
+        spin = 2 + (self.age[slots] // SPIN_STEPS) % SPIN_FRAMES
+        return np.where(self.kind[slots] == KNIFE, (self.vx[slots] < 0).astype(np.int64), spin)
+
+
+    def draw(self, alpha=1):
+        """Everything in one Surface.blits() call, part way (alpha) between
+        the last two steps.
+        """
+        live = np.flatnonzero(self.alive)
+        self.blitted = live.size
+        if not live.size:
+            self.drawn_rect = None
+            return
+
+        prev_x = self.prev_x[live]
+        prev_y = self.prev_y[live]
+        screen_x = np.rint(prev_x + (self.x[live] - prev_x) * alpha).astype(np.int64) - self.camera.draw_x
+        screen_y = np.rint(prev_y + (self.y[live] - prev_y) * alpha).astype(np.int64) - self.camera.draw_y
+
+        image = self.frames(live)
+        screen_x -= self.offset_x[image]
+        screen_y -= self.offset_y[image]
+
+        images = self.images
+        self.screen.blits(list(zip([images[i] for i in image.tolist()],
+                                   zip(screen_x.tolist(), screen_y.tolist()))), doreturn=False)
+
+        left = int(screen_x.min())
+        top = int(screen_y.min())
+        self.drawn_rect = pygame.Rect(left, top,
+                                      int((screen_x + self.image_w[image]).max()) - left,
+                                      int((screen_y + self.image_h[image]).max()) - top)
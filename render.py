@@ -0,0 +1,129 @@
+from itertools import chain
+import pygame
+
+
+# LAYERS OF A RenderQueue, BACK TO FRONT
+BACKGROUND = 0
+LEVEL = 1
+ENEMIES = 2
+PLAYER = 3
+PROJECTILES = 4
+LAYER_COUNT = 5
+
+
+# DIRTY RECTANGLE RENDERING
+################################################################################
+class DirtyRenderer:
+
+    def __init__(self, screen, camera):
+        """Only pushes the parts of the screen the sprites moved over.
+        While the camera holds still the background and level layers are
+        kept in a copy of the screen and restored under the sprites. When
+        the camera moves the whole frame is drawn and flipped.
+        """
+        self.screen = screen
+        self.camera = camera
+
+        self.background = pygame.Surface(screen.get_size()).convert()
+        self.background_pos = None
+
+        self.last_rects = []
+        self.sprite_rects = {}
+        self.full = True
+
+
+    def begin(self):
+        """Start a frame. Returns True when the static layers must be drawn."""
+        self.full = self.background_pos != (self.camera.draw_x, self.camera.draw_y)
+        if not self.full:
+            for rect in self.last_rects:
+                self.screen.blit(self.background, rect, rect)
+        return self.full
+
+
+    def save_background(self):
+        """Keep what is on screen now, before any sprite is drawn."""
+        self.background.blit(self.screen, (0, 0))
+        self.background_pos = (self.camera.draw_x, self.camera.draw_y)
+
+
+    def sprite_rect(self, sprite):
+        """Screen area a sprite's image covered when it was last drawn."""
+        rect = getattr(sprite, 'drawn_rect', None)
+        if rect is None:
+            rect = pygame.Rect(self.camera.apply(sprite.rect), sprite.image.get_size())
+        return rect
+
+
+    def present(self, sprites):
+        # COVER EVERYTHING BETWEEN WHERE A SPRITE WAS AND WHERE IT IS
+        rects = []
+        sprite_rects = {}
+        for sprite in sprites:
+            rect = self.sprite_rect(sprite)
+            sprite_rects[id(sprite)] = rect
+            last = self.sprite_rects.get(id(sprite))
+            rects.append(rect.union(last) if last else rect)
+        self.sprite_rects = sprite_rects
+
+        if self.full:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.last_rects + rects)
+
+        self.last_rects = rects
+
+
+# RENDER QUEUE
+################################################################################
+class QueueLayer(list):
+
+    def __init__(self, clip):
+        """(source, dest) blits of one layer of a RenderQueue. Takes blit()
+        and blits() like a Surface, so whatever draws to the screen can draw
+        to a layer instead.
+        """
+        super().__init__()
+        self.clip = clip
+
+    def covers(self, blit):
+        """The part of the screen a queued blit will cover."""
+        source, dest = blit[0], blit[1]
+        size = pygame.Rect(blit[2]).size if len(blit) > 2 else source.get_size()
+        return pygame.Rect((dest[0], dest[1]), size).clip(self.clip)
+
+    def blit(self, source, dest, area=None):
+        """Queue one blit. Returns what it will cover, like Surface.blit()."""
+        blit = (source, dest) if area is None else (source, dest, area)
+        self.append(blit)
+        return self.covers(blit)
+
+    def blits(self, blit_sequence, doreturn=True):
+        start = len(self)
+        self.extend(blit_sequence)
+        if doreturn:
+            return [self.covers(blit) for blit in self[start:]]
+
+
+class RenderQueue:
+
+    def __init__(self, screen, layers=LAYER_COUNT):
+        """Collects the blits of a frame by layer and hands them to the
+        screen in one Surface.blits() call, back to front. Within a layer
+        blits keep the order they were queued in.
+        """
+        self.screen = screen
+        self.layers = [QueueLayer(screen.get_rect()) for layer in range(layers)]
+        self.blitted = 0
+
+    def __getitem__(self, layer):
+        return self.layers[layer]
+
+    def flush(self):
+        """Blit everything queued and empty the queue."""
+        blits = list(chain.from_iterable(self.layers))
+        if blits:
+            self.screen.blits(blits, doreturn=False)
+        for layer in self.layers:
+            layer.clear()
+        self.blitted = len(blits)
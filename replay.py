@@ -0,0 +1,63 @@
+import pygame
+
+
+# Recorded input, one bitmask of GAME_KEYS per simulation step.
+# Files are plain text, one "mask count" run per line.
+
+GAME_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_SPACE)
+
+
+def encode(keys):
+    """Bitmask of the game keys held in a pygame.key.get_pressed() result."""
+    mask = 0
+    for bit, key in enumerate(GAME_KEYS):
+        if keys[key]:
+            mask |= 1 << bit
+    return mask
+
+
+class KeyState:
+
+    def __init__(self, mask):
+        """Stands in for pygame.key.get_pressed() during a replay."""
+        self.mask = mask
+
+    def __getitem__(self, key):
+        if key in GAME_KEYS:
+            return bool(self.mask >> GAME_KEYS.index(key) & 1)
+        return False
+
+
+class InputRecorder:
+
+    def __init__(self):
+        self.masks = []
+
+    def record(self, keys):
+        self.masks.append(encode(keys))
+
+    def save(self, path):
+        save_inputs(path, self.masks)
+
+
+def save_inputs(path, masks):
+    runs = []
+    for mask in masks:
+        if runs and runs[-1][0] == mask:
+            runs[-1][1] += 1
+        else:
+            runs.append([mask, 1])
+
+    with open(path, 'w') as f:
+        for mask, count in runs:
+            f.write(f"{mask} {count}\n")
+
+
+def load_inputs(path):
+    masks = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                mask, count = line.split()
+                masks.extend([int(mask)] * int(count))
+    return masks
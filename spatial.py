@@ -0,0 +1,219 @@
+import numpy as np
+import pygame
+
+
+SOLID = ('b', 'g')
+
+# FILLS THE UNUSED SLOTS OF RectBands, IT OVERLAPS NOTHING
+EMPTY_RECT = (np.inf, np.inf, -np.inf, -np.inf)
+
+
+# UNIFORM GRID OF TILES
+################################################################################
+class TileGrid:
+
+    def __init__(self, cell_size, tiles=(), tags=SOLID):
+        """Buckets (surface, rect, tag) tiles by the block_size cells they cover.
+        Only tiles whose tag is in tags are kept, so a query only ever sees
+        the tiles a caller can collide with. tags=None keeps every tile.
+        Results come back in insertion order, like scanning the tile list.
+        """
+        self.cell_size = cell_size
+        self.tags = tags
+
+        self.cells = {}
+        self.tile_cells = {}
+        self.order = {}
+        self.count = 0
+
+        self.insert_all(tiles)
+
+
+    def cell_range(self, x, y, width, height):
+        size = self.cell_size
+        return (int(x // size), int((x + max(width, 1) - 1) // size),
+                int(y // size), int((y + max(height, 1) - 1) // size))
+
+
+    def insert(self, tile):
+        if self.tags is not None and tile[2] not in self.tags:
+            return
+
+        col_1, col_2, row_1, row_2 = self.cell_range(*tile[1])
+        keys = [(col, row) for col in range(col_1, col_2 + 1) for row in range(row_1, row_2 + 1)]
+        for key in keys:
+            self.cells.setdefault(key, []).append(tile)
+        self.tile_cells[id(tile)] = keys
+        self.order[id(tile)] = self.count
+        self.count += 1
+
+
+    def insert_all(self, tiles):
+        for tile in tiles:
+            self.insert(tile)
+
+
+    def clear(self):
+        self.cells.clear()
+        self.tile_cells.clear()
+        self.order.clear()
+
+
+    def remove(self, tile):
+        self.order.pop(id(tile), None)
+        for key in self.tile_cells.pop(id(tile), ()):
+            bucket = self.cells[key]
+            bucket.remove(tile)
+            if not bucket:
+                del self.cells[key]
+
+
+    def candidates(self, rect):
+        """Every tile in the cells rect covers, without the overlap test."""
+        col_1, col_2, row_1, row_2 = self.cell_range(*rect)
+
+        found = {}
+        for col in range(col_1, col_2 + 1):
+            for row in range(row_1, row_2 + 1):
+                for tile in self.cells.get((col, row), ()):
+                    found[id(tile)] = tile
+
+        if len(found) < 2:
+            return list(found.values())
+        order = self.order
+        return [found[key] for key in sorted(found, key=order.__getitem__)]
+
+
+    def query(self, rect):
+        """Tiles overlapping rect, which can be a Rect or (x, y, w, h)."""
+        rect = pygame.Rect(rect)
+        return [tile for tile in self.candidates(rect) if tile[1].colliderect(rect)]
+
+
+def rect_arrays(rects):
+    """left, top, right, bottom arrays of a list of rects."""
+    edges = np.array([(rect[0], rect[1], rect[0] + rect[2], rect[1] + rect[3]) for rect in rects],
+                     np.float64).reshape(-1, 4)
+    return edges.T
+
+
+def overlaps(left, top, right, bottom, rects):
+    """Which boxes overlap which rects. rects is left, top, right and
+    bottom like rect_arrays() returns, or the edges of one rect, and is
+    compared with the boxes under numpy broadcasting. Touching edges do
+    not count, like Rect.colliderect().
+    """
+    r_left, r_top, r_right, r_bottom = rects
+    return (left < r_right) & (right > r_left) & (top < r_bottom) & (bottom > r_top)
+
+
+# BANDS OF RECT ARRAYS
+################################################################################
+class RectBands:
+
+    def __init__(self, edges, band_w):
+        """Rects, given as rect_arrays(), put in every band_w wide column
+        band they cover and padded into one (bands, most, 4) table, so many
+        boxes can be tested against the rects of their own bands at once.
+        A box no wider than band_w covers at most two bands, wider ones
+        are tested a band_w wide piece at a time. The first and last band
+        are empty, boxes outside the rects land there.
+        """
+        left, top, right, bottom = edges
+        self.band_w = band_w
+
+        if not left.size:
+            self.first = 0
+            self.table = np.full((1, 1, 4), EMPTY_RECT)
+            return
+
+        band_1 = (left // band_w).astype(np.int64)
+        band_2 = ((right - 1) // band_w).astype(np.int64)
+        self.first = int(band_1.min()) - 1
+
+        # ONE ENTRY PER RECT AND BAND IT COVERS, GROUPED BY BAND
+        covers = band_2 - band_1 + 1
+        rect = np.repeat(np.arange(left.size), covers)
+        band = np.repeat(band_1 - self.first, covers) + np.arange(rect.size) - np.repeat(np.cumsum(covers) - covers, covers)
+        order = np.argsort(band, kind='stable')
+        rect = rect[order]
+        band = band[order]
+
+        per_band = np.bincount(band, minlength=int(band_2.max()) - self.first + 2)
+        slot = np.arange(band.size) - np.repeat(np.cumsum(per_band) - per_band, per_band)
+
+        self.table = np.full((per_band.size, int(per_band.max()), 4), EMPTY_RECT)
+        self.table[band, slot] = np.stack(edges, 1)[rect]
+
+
+    def overlaps(self, left, top, right, bottom):
+        """Which of the boxes overlap any of the rects. Touching edges do
+        not count, like Rect.colliderect().
+        """
+        width = (right - left).max() if len(left) else 0
+        hit = np.zeros(len(left), bool)
+        for piece in range(max(int(-(-width // self.band_w)), 1)):
+            piece_left = left + piece * self.band_w
+            piece_right = np.minimum(piece_left + self.band_w, right)
+
+            # THE BANDS OF BOTH ENDS OF EVERY PIECE, THEIR RECTS SIDE BY SIDE
+            band = np.stack((piece_left, piece_right - 1), 1) // self.band_w - self.first
+            band = np.minimum(np.maximum(band, 0), len(self.table) - 1).astype(np.int64)
+            rects = self.table[band].reshape(len(band), -1, 4)
+
+            overlap = overlaps(piece_left[:, None], top[:, None], piece_right[:, None], bottom[:, None],
+                               np.moveaxis(rects, -1, 0)).any(axis=1)
+            if piece:
+                overlap &= piece_left < right
+            hit |= overlap
+        return hit
+
+
+# COLLISION SPANS
+################################################################################
+def merge_spans(xs, ys, cell_size):
+    """Merge one-cell tiles, given by the x and y of their top left
+    corners, into as few rects as possible.
+    Cells are joined into horizontal runs first, then runs with the same
+    columns on the rows below are stacked onto them.
+    """
+    rows = {}
+    for x, y in zip(xs, ys):
+        rows.setdefault(y // cell_size, set()).add(x // cell_size)
+
+    spans = []
+    open_spans = {}
+
+    for row in sorted(rows):
+        cols = sorted(rows[row])
+
+        # HORIZONTAL RUNS ON THIS ROW
+        runs = []
+        start = prev = cols[0]
+        for col in cols[1:]:
+            if col != prev + 1:
+                runs.append((start, prev))
+                start = col
+            prev = col
+        runs.append((start, prev))
+
+        # STACK ON THE SAME RUN FROM THE ROW ABOVE
+        still_open = {}
+        for run in runs:
+            span = open_spans.pop(run, None)
+            if span is not None and span[1] == row - 1:
+                span[1] = row
+            else:
+                if span is not None:
+                    spans.append((run, span))
+                span = [row, row]
+            still_open[run] = span
+
+        spans.extend(open_spans.items())
+        open_spans = still_open
+
+    spans.extend(open_spans.items())
+
+    return [pygame.Rect(col_1 * cell_size, row_1 * cell_size,
+                        (col_2 - col_1 + 1) * cell_size, (row_2 - row_1 + 1) * cell_size)
+            for (col_1, col_2), (row_1, row_2) in spans]
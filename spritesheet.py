@@ -0,0 +1,199 @@
+import pygame
+from collections import OrderedDict
+
+
+# SURFACE CACHE
+################################################################################
+class SurfaceCache:
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        """Shared, keyed store of decoded and derived surfaces.
+        Entries are evicted least recently used first once the total pixel
+        memory goes over max_bytes.
+        """
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # FILENAME: FUTURE OF AN IMAGE BEING DECODED BY AN AssetLoader
+        self.pending = {}
+
+
+    def get(self, key):
+        """Return the cached surface for key, or None."""
+        surface = self.entries.get(key)
+        if surface is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return surface
+
+
+    def put(self, key, surface):
+        """Store a surface and evict old entries if over the memory cap."""
+        if key in self.entries:
+            self.bytes -= self.surface_bytes(self.entries.pop(key))
+
+        self.entries[key] = surface
+        self.bytes += self.surface_bytes(surface)
+
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            old_key, old_surface = self.entries.popitem(last=False)
+            self.bytes -= self.surface_bytes(old_surface)
+            self.evictions += 1
+        return surface
+
+
+    def load(self, filename, alpha=False):
+        """Load a whole image file once, converted to the display format.
+        A file a loader thread is already decoding is waited for instead.
+        """
+        key = self.file_key(filename, alpha)
+        surface = self.get(key)
+        if surface is None:
+            future = self.pending.pop(filename, None)
+            surface = future.result() if future is not None else pygame.image.load(filename)
+            surface = surface.convert_alpha() if alpha else surface.convert()
+            self.put(key, surface)
+        return surface
+
+
+    @staticmethod
+    def file_key(filename, alpha=False):
+        return (filename, None, None, None, (False, False), alpha)
+
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self.entries), 'bytes': self.bytes}
+
+
+    @staticmethod
+    def surface_bytes(surface):
+        return surface.get_pitch() * surface.get_height()
+
+
+# ONE CACHE FOR THE WHOLE GAME
+surface_cache = SurfaceCache()
+
+
+# SPRITE SHEET METHODS
+################################################################################
+class SpriteSheet:
+
+    def __init__(self, filename, cache=surface_cache):
+        """Remember the sheet. It is only decoded when a frame is not cached."""
+        self.filename = filename
+        self.cache = cache
+
+
+    @property
+    def sheet(self):
+        try:
+            return self.cache.load(self.filename)
+        except (pygame.error, FileNotFoundError) as e:
+            print(f"Unable to load spritesheet image: {self.filename}")
+            raise SystemExit(e)
+
+
+    def image_at(self, rectangle, colorkey=None, scale=None, flip=(False, False), alpha=False):
+        """Load a specific image from a specific rectangle."""
+        """rectangle is a tuple with (x, y, x+offset, y+offset)"""
+        """scale, flip and alpha are applied in that order after the colorkey,
+        and the finished surface is shared through the cache so callers
+        must not draw onto it."""
+        rect = pygame.Rect(rectangle)
+        if scale is not None:
+            scale = (int(scale[0]), int(scale[1]))
+        flip = (bool(flip[0]), bool(flip[1]))
+
+        key = (self.filename, tuple(rect), colorkey, scale, flip, alpha)
+        image = self.cache.get(key)
+        if image is not None:
+            return image
+
+        # FLIPPED FRAMES ARE MADE FROM THE CACHED UNFLIPPED ONE
+        if flip != (False, False):
+            image = self.image_at(rect, colorkey, scale, alpha=alpha)
+            return self.cache.put(key, pygame.transform.flip(image, *flip))
+
+        image = pygame.Surface(rect.size).convert()
+        image.blit(self.sheet, (0, 0), rect)
+
+        if colorkey is not None:
+            if colorkey == -1:
+                colorkey = image.get_at((0, 0))
+            image.set_colorkey(colorkey, pygame.RLEACCEL)
+
+        if alpha:
+            image = image.convert_alpha()
+
+        if scale is not None:
+            image = pygame.transform.scale(image, scale)
+
+        return self.cache.put(key, image)
+
+
+    def images_at(self, rects, colorkey=None, scale=None, flip=(False, False), alpha=False):
+        """Load a whole bunch of images and return them as a list."""
+        return [self.image_at(rect, colorkey, scale, flip, alpha) for rect in rects]
+
+
+    def load_strip(self, rect, image_count, colorkey=None):
+        """Load a whole strip of images, and return them as a list."""
+        tups = [(rect[0] + rect[2] * x, rect[1], rect[2], rect[3])
+                for x in range(image_count)]
+        return self.images_at(tups, colorkey)
+
+
+    def grid_rects(self, num_rows, num_cols, x_margin=0, x_padding=0, y_margin=0, y_padding=0, width = None, height = None):
+        """Rectangles of a grid of images, see load_grid_images()."""
+        if width and height:
+            x_sprite_size = width
+            y_sprite_size = height
+
+        else:
+            sheet_rect = self.sheet.get_rect()
+            sheet_width, sheet_height = sheet_rect.size
+
+            # To calculate the size of each sprite, subtract the two margins,
+            #   and the padding between each row, then divide by num_cols.
+            # Same reasoning for y.
+            x_sprite_size = (sheet_width - 2 * x_margin
+                             - (num_cols - 1) * x_padding) / num_cols
+            y_sprite_size = (sheet_height - 2 * y_margin
+                             - (num_rows - 1) * y_padding) / num_rows
+
+        sprite_rects = []
+        for row_num in range(num_rows):
+            for col_num in range(num_cols):
+                # Position of sprite rect is margin + one sprite size
+                #   and one padding size for each row. Same for y.
+                x = x_margin + col_num * (x_sprite_size + x_padding)
+                y = y_margin + row_num * (y_sprite_size + y_padding)
+                sprite_rect = (x, y, x_sprite_size, y_sprite_size)
+                sprite_rects.append(sprite_rect)
+
+        return sprite_rects
+
+
+    def load_grid_images(self, num_rows, num_cols, x_margin=0, x_padding=0, y_margin=0, y_padding=0, width = None, height = None, colorkey = None, scale=None, flip=(False, False)):
+        """Load a grid of images.
+        x_margin is the space between the top of the sheet and top of the first
+        row. x_padding is space between rows. Assumes symmetrical padding on
+        left and right.  Same reasoning for y. Calls self.images_at() to get a
+        list of images.
+        """
+        sprite_rects = self.grid_rects(num_rows, num_cols, x_margin, x_padding, y_margin, y_padding, width, height)
+        return self.images_at(sprite_rects, colorkey, scale, flip)
@@ -0,0 +1,9 @@
+import os, sys
+
+# NO WINDOW, AND THE GAME LOADS ITS IMAGES FROM THE REPO ROOT
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
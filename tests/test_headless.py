@@ -0,0 +1,23 @@
+import os
+import headless
+from replay import load_inputs
+
+
+# A short run through Level_1: running both ways, jumping and throwing
+# knives up to the end of the level. When a change is meant to alter the
+# simulation, run
+#
+#   python headless.py tests/level_1.keys
+#
+# and put the digest it prints here.
+LEVEL_1_KEYS = os.path.join(os.path.dirname(__file__), 'level_1.keys')
+LEVEL_1_DIGEST = '7b5315764a9f3d56a6ff85aa2b906d375e64386f78a6d0bf6a1838cfa58926db'
+
+
+def test_level_1_replay_digest():
+    assert headless.simulate(load_inputs(LEVEL_1_KEYS)) == LEVEL_1_DIGEST
+
+
+def test_replay_is_repeatable():
+    inputs = load_inputs(LEVEL_1_KEYS)[:120]
+    assert headless.simulate(inputs) == headless.simulate(inputs)
@@ -0,0 +1,43 @@
+import numpy as np
+import map_design
+from levelpack import FULL_BLOCKS, LevelPack, compile_level
+from spatial import merge_spans
+from tiles import layout_cells
+
+
+def test_round_trip(tmp_path):
+    layouts = (map_design.Level_1, map_design.Level_1_plants, map_design.level_1_enemy)
+    path = tmp_path / 'level.nlvl'
+    compile_level(path, *layouts)
+    pack = LevelPack(path)
+
+    for layout, layer in zip(layouts, pack.layouts()):
+        assert layer.columns == max(len(row) for row in layouts[0] + layouts[1] + layouts[2])
+        cells = layout_cells(layout)
+        packed = layer.cells()
+        assert np.array_equal(packed[:cells.shape[0], :cells.shape[1]], cells)
+        assert (packed[cells.shape[0]:] == ord('0')).all()
+        assert (packed[:, cells.shape[1]:] == ord('0')).all()
+
+        # A RUN OF COLUMNS READS THE SAME AS CUTTING THE LAYOUT
+        assert np.array_equal(layer.cells(10, 30)[:cells.shape[0]], layout_cells(layout, 10, 30))
+
+
+def test_spans_cover_the_full_blocks(tmp_path):
+    layout = ['0000', 'GG0p', 'GGPp', '0t00']
+    compile_level(tmp_path / 'level.nlvl', layout, [], [])
+    pack = LevelPack(tmp_path / 'level.nlvl')
+
+    rows, cols = np.nonzero(np.isin(layout_cells(layout), [ord(char) for char in FULL_BLOCKS]))
+    expected = merge_spans(cols.tolist(), rows.tolist(), 1)
+    assert sorted(map(tuple, pack.spans.tolist())) == sorted(map(tuple, expected))
+
+
+def test_not_a_pack(tmp_path):
+    path = tmp_path / 'level.nlvl'
+    path.write_bytes(bytes(64))
+    try:
+        LevelPack(path)
+    except ValueError:
+        return
+    raise AssertionError('read a file that is not a level pack')
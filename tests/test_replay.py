@@ -0,0 +1,41 @@
+import pygame
+from replay import GAME_KEYS, KeyState, InputRecorder, encode, load_inputs, save_inputs
+
+
+def pressed(*keys):
+    """Stands in for pygame.key.get_pressed() with keys held."""
+    return {key: key in keys for key in GAME_KEYS + (pygame.K_a,)}
+
+
+def test_encode_sets_one_bit_per_key():
+    assert encode(pressed()) == 0
+    assert encode(pressed(pygame.K_LEFT)) == 1
+    assert encode(pressed(pygame.K_RIGHT, pygame.K_SPACE)) == 2 | 8
+    assert encode(pressed(*GAME_KEYS)) == 15
+
+
+def test_encode_ignores_other_keys():
+    assert encode(pressed(pygame.K_a, pygame.K_UP)) == 4
+
+
+def test_key_state_decodes_encode():
+    for mask in range(16):
+        keys = KeyState(mask)
+        assert encode(keys) == mask
+        assert not keys[pygame.K_a]
+
+
+def test_inputs_round_trip(tmp_path):
+    masks = [0, 0, 2, 2, 2, 10, 2, 0, 5]
+    path = tmp_path / 'run.keys'
+    save_inputs(path, masks)
+    assert path.read_text().splitlines()[:3] == ['0 2', '2 3', '10 1']
+    assert load_inputs(path) == masks
+
+
+def test_recorder_saves_what_it_recorded(tmp_path):
+    recorder = InputRecorder()
+    for keys in (pressed(), pressed(pygame.K_RIGHT), pressed(pygame.K_RIGHT), pressed(pygame.K_UP)):
+        recorder.record(keys)
+    recorder.save(tmp_path / 'run.keys')
+    assert load_inputs(tmp_path / 'run.keys') == [0, 2, 2, 4]
@@ -0,0 +1,64 @@
+import numpy as np
+import pygame
+from spatial import RectBands, merge_spans, rect_arrays
+
+
+def cells_of(rects, size):
+    return {(x, y) for rect in rects
+            for x in range(rect.left, rect.right, size) for y in range(rect.top, rect.bottom, size)}
+
+
+def test_merge_spans_joins_runs_then_rows():
+    # TWO ROWS OF THE SAME RUN AND ONE LONGER ROW UNDER THEM
+    cells = [(0, 0), (10, 0), (0, 10), (10, 10), (0, 20), (10, 20), (20, 20)]
+    spans = merge_spans([x for x, y in cells], [y for x, y in cells], 10)
+    assert sorted(map(tuple, spans)) == [(0, 0, 20, 20), (0, 20, 30, 10)]
+
+
+def test_merge_spans_covers_every_cell_once():
+    rng = np.random.default_rng(0)
+    cells = {(int(x) * 8, int(y) * 8) for x, y in rng.integers(0, 30, (300, 2))}
+    spans = merge_spans([x for x, y in cells], [y for x, y in cells], 8)
+    assert cells_of(spans, 8) == cells
+    assert sum(span.w * span.h for span in spans) == len(cells) * 64
+
+
+def test_merge_spans_of_nothing():
+    assert merge_spans([], [], 10) == []
+
+
+def brute_force(rects, left, top, right, bottom):
+    hit = np.zeros(len(left), bool)
+    for index in range(len(left)):
+        box = pygame.Rect(left[index], top[index], right[index] - left[index], bottom[index] - top[index])
+        hit[index] = box.collidelist(rects) != -1
+    return hit
+
+
+def test_rect_bands_match_colliderect():
+    rng = np.random.default_rng(1)
+    rects = [pygame.Rect(int(x), int(y), int(w), int(h)) for x, y, w, h in
+             zip(rng.integers(0, 3000, 40), rng.integers(0, 600, 40), rng.integers(1, 400, 40), rng.integers(1, 100, 40))]
+    bands = RectBands(rect_arrays(rects), 200)
+
+    # NARROW BOXES AND ONES MANY BANDS WIDE
+    for widest in (200, 1500):
+        left = rng.integers(-500, 3500, 300)
+        top = rng.integers(-50, 650, 300)
+        right = left + rng.integers(1, widest, 300)
+        bottom = top + rng.integers(1, 60, 300)
+        assert (bands.overlaps(left, top, right, bottom) == brute_force(rects, left, top, right, bottom)).all()
+
+
+def test_rect_bands_touching_edges_do_not_count():
+    bands = RectBands(rect_arrays([(100, 100, 50, 50)]), 200)
+    left = np.array([50, 150, 100, 100, 149])
+    top = np.array([100, 100, 50, 150, 149])
+    hit = bands.overlaps(left, top, left + 50, top + 50)
+    assert hit.tolist() == [False, False, False, False, True]
+
+
+def test_rect_bands_without_rects():
+    bands = RectBands(rect_arrays([]), 200)
+    left = np.array([0, 1000])
+    assert not bands.overlaps(left, left, left + 10, left + 10).any()
@@ -0,0 +1,62 @@
+import numpy as np
+import pygame
+from tiles import TileStore, SOLID, layout_cells, layout_positions
+
+
+def store():
+    tiles = TileStore()
+    ground = tiles.add_kind(pygame.Surface((50, 50)), 'g')
+    tree = tiles.add_kind(pygame.Surface((100, 100)), 't')
+    return tiles, ground, tree
+
+
+def test_kinds_size_the_tiles():
+    tiles, ground, tree = store()
+    tiles.extend([ground, tree, ground], [0, 50, 100], [0, 0, 50])
+    assert len(tiles) == 3
+    assert tiles.w.tolist() == [50, 100, 50]
+    assert tiles.rect(1) == pygame.Rect(50, 0, 100, 100)
+    assert tiles.tag(1) == 't'
+    assert tiles.nbytes == 12 * 3
+
+
+def test_shared_palette():
+    tiles, ground, tree = store()
+    section = TileStore(tiles)
+    assert section.append(tree, 10, 20) == 0
+    assert section.rect(0) == pygame.Rect(10, 20, 100, 100)
+
+
+def test_add_cells_goes_row_by_row():
+    tiles, ground, tree = store()
+    cells = layout_cells(['G00', '0tG'])
+    tiles.add_cells(cells, {'G': ground, 't': tree}, 50, x=1000)
+    assert list(zip(tiles.kind.tolist(), tiles.x.tolist(), tiles.y.tolist())) == [
+        (ground, 1000, 0), (tree, 1050, 50), (ground, 1100, 50)]
+
+
+def test_overlapping_in_added_order_and_skips_removed():
+    tiles, ground, tree = store()
+    tiles.extend([ground, tree, ground, ground], [0, 40, 100, 200], [0, 0, 0, 0])
+    assert tiles.overlapping((30, 10, 100, 10)).tolist() == [0, 1, 2]
+    # TOUCHING EDGES DO NOT COUNT
+    assert tiles.overlapping((50, 0, 50, 50)).tolist() == [1]
+
+    tiles.remove(1)
+    assert tiles.overlapping((30, 10, 100, 10)).tolist() == [0, 2]
+    assert len(tiles.tuples()) == 3
+
+
+def test_overlapping_by_flags():
+    tiles, ground, tree = store()
+    tiles.extend([ground, tree], [0, 0], [0, 0])
+    solid = tiles.mask(SOLID)
+    assert solid.tolist() == [True, False]
+    assert tiles.overlapping((0, 0, 10, 10), SOLID).tolist() == [0]
+
+
+def test_layout_positions():
+    cells = layout_cells(['0N0', 'E0N'])
+    assert layout_positions(cells, 'N', 10) == [(10, 0), (20, 10)]
+    assert layout_positions(cells, 'x', 10) == []
+    assert np.array_equal(layout_cells(['ab', 'c'], 1), np.frombuffer(b'b0', np.uint8).reshape(2, 1))
@@ -0,0 +1,192 @@
+import numpy as np
+import pygame
+from spatial import overlaps
+
+
+# TILE FLAGS, ONE BIT EACH
+SOLID = 1
+GATE = 2
+DECORATION = 4
+MARKER = 8
+REMOVED = 128
+
+# WHAT THE OLD ONE LETTER TAGS MEAN
+TAG_FLAGS = {'b': SOLID, 'g': SOLID | GATE, 'p': DECORATION, 'e': MARKER}
+
+NO_KIND = 255
+
+
+def layout_positions(cells, char, cell_size):
+    """x, y of every cell holding char, row by row."""
+    rows, cols = np.nonzero(cells == ord(char))
+    return list(zip((cols * cell_size).tolist(), (rows * cell_size).tolist()))
+
+
+def layout_columns(layout):
+    columns = getattr(layout, 'columns', None)
+    if columns is None:
+        columns = max([len(row) for row in layout] + [0])
+    return columns
+
+
+def layout_cells(layout, col_1=0, col_2=None):
+    """Columns col_1 up to col_2 of a layout as a rows x columns array of
+    character codes. The layout is a list of strings or a packed layer.
+    """
+    if hasattr(layout, 'cells'):
+        return layout.cells(col_1, col_2)
+
+    rows = [row[col_1:col_2] for row in layout]
+    if not rows:
+        return np.zeros((0, 0), np.uint8)
+    width = max(len(row) for row in rows)
+    text = ''.join(row.ljust(width, '0') for row in rows)
+    return np.frombuffer(text.encode('ascii'), np.uint8).reshape(len(rows), width)
+
+
+# TILE STORE
+################################################################################
+class TileStore:
+
+    def __init__(self, kinds=None):
+        """Every tile of a level in flat arrays, 12 bytes a tile.
+        kind indexes the palette, which holds the one shared surface and
+        tag of each kind of tile. Tiles stay in the order they were added,
+        which is the order they are drawn in.
+        kinds is another store to share the palette of.
+        """
+        self.palette = []
+
+        self.kind = np.zeros(0, np.uint8)
+        self.x = np.zeros(0, np.int32)
+        self.y = np.zeros(0, np.int16)
+        self.w = np.zeros(0, np.uint16)
+        self.h = np.zeros(0, np.uint16)
+        self.flags = np.zeros(0, np.uint8)
+
+        # SIZE AND FLAGS OF EACH KIND, LOOKED UP WITH THE KIND ARRAY
+        self.kind_w = np.zeros(0, np.uint16)
+        self.kind_h = np.zeros(0, np.uint16)
+        self.kind_flags = np.zeros(0, np.uint8)
+
+        if kinds is not None:
+            self.palette = kinds.palette
+            self.kind_w = kinds.kind_w
+            self.kind_h = kinds.kind_h
+            self.kind_flags = kinds.kind_flags
+
+
+    def __len__(self):
+        return len(self.kind)
+
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.kind, self.x, self.y, self.w, self.h, self.flags))
+
+
+    def add_kind(self, surface, tag):
+        """Put a surface in the palette, returns its kind id."""
+        self.palette.append((surface, tag))
+        width, height = surface.get_size()
+        self.kind_w = np.append(self.kind_w, np.uint16(width))
+        self.kind_h = np.append(self.kind_h, np.uint16(height))
+        self.kind_flags = np.append(self.kind_flags, np.uint8(TAG_FLAGS.get(tag, 0)))
+        return len(self.palette) - 1
+
+
+    def extend(self, kinds, xs, ys):
+        """Add many tiles of the given kinds at once."""
+        kinds = np.asarray(kinds, np.uint8)
+        start = len(self.kind)
+
+        self.kind = np.concatenate((self.kind, kinds))
+        self.x = np.concatenate((self.x, np.asarray(xs, np.int32)))
+        self.y = np.concatenate((self.y, np.asarray(ys, np.int16)))
+        self.w = np.concatenate((self.w, self.kind_w[kinds]))
+        self.h = np.concatenate((self.h, self.kind_h[kinds]))
+        self.flags = np.concatenate((self.flags, self.kind_flags[kinds]))
+        return range(start, len(self.kind))
+
+
+    def append(self, kind, x, y):
+        return self.extend([kind], [x], [y]).start
+
+
+    def add_cells(self, cells, codes, cell_size, x=0):
+        """Add a tile for every cell of a layout_cells() array whose
+        character is in codes, a {character: kind} dict. Tiles go in row
+        by row, like reading the layout. x is where the first column is.
+        """
+        table = np.full(256, NO_KIND, np.uint8)
+        for char, kind in codes.items():
+            table[ord(char)] = kind
+
+        kinds = table[cells]
+        index = np.flatnonzero(kinds != NO_KIND)
+        columns = cells.shape[1] if cells.ndim == 2 else 1
+        return self.extend(kinds.flat[index], index % columns * cell_size + x, index // columns * cell_size)
+
+
+    def remove(self, index):
+        """Tiles are only flagged as removed, the indices of the others stay."""
+        self.flags[index] |= REMOVED
+
+
+    def mask(self, flags=None, kinds=None):
+        """Boolean array of the live tiles with any of flags set and,
+        if given, of one of kinds.
+        """
+        live = (self.flags & REMOVED) == 0
+        if flags is not None:
+            live &= (self.flags & flags) != 0
+        if kinds is not None:
+            live &= np.isin(self.kind, kinds)
+        return live
+
+
+    def overlapping(self, rect, flags=None):
+        """Indices of the tiles overlapping rect, in the order they were added."""
+        left, top, width, height = rect
+        hit = self.mask(flags)
+        hit &= overlaps(self.x, self.y, self.x + self.w, self.y + self.h, (left, top, left + width, top + height))
+        return np.flatnonzero(hit)
+
+
+    def bottom(self):
+        live = self.mask()
+        if not live.any():
+            return 0
+        return int((self.y[live].astype(np.int32) + self.h[live]).max())
+
+
+    def surface(self, index):
+        return self.palette[self.kind[index]][0]
+
+
+    def tag(self, index):
+        return self.palette[self.kind[index]][1]
+
+
+    def rect(self, index):
+        return pygame.Rect(int(self.x[index]), int(self.y[index]), int(self.w[index]), int(self.h[index]))
+
+
+    def placed(self, indices):
+        """(surface, x, y) of the tiles at indices, for drawing."""
+        palette = self.palette
+        return [(palette[kind][0], x, y)
+                for kind, x, y in zip(self.kind[indices].tolist(), self.x[indices].tolist(), self.y[indices].tolist())]
+
+
+    def tuples(self, indices=None):
+        """Tiles as the old (surface, rect, tag) tuples, for the few places
+        that still want one object per tile.
+        """
+        if indices is None:
+            indices = np.flatnonzero(self.mask())
+        palette = self.palette
+        return [(palette[kind][0], pygame.Rect(x, y, w, h), palette[kind][1])
+                for kind, x, y, w, h in zip(self.kind[indices].tolist(), self.x[indices].tolist(),
+                                            self.y[indices].tolist(), self.w[indices].tolist(),
+                                            self.h[indices].tolist())]